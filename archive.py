@@ -0,0 +1,239 @@
+import json
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+from metrics import registry
+from serialization import dumps, orjson
+
+# ========== COLD TIER: ARCHIVED PAs ==========
+# Finalized PAs older than EPOCHPA_ARCHIVE_AFTER_DAYS leave the in-memory store
+# and are written to immutable segment files, one per sweep (new sweeps only ever
+# add files, so the archive is append-only):
+#
+#   block*   zlib(JSON lines), records sorted by id, BLOCK_RECORDS per block
+#   index    JSON [[first_id, offset, length, count, last_id], ...]  (one entry per block)
+#   footer   index offset u64 | b"EPAS"
+#
+# Only the sparse per-block index stays in memory. A lookup skips segments whose
+# [first id, last id] range can't hold the id, bisects the rest and decompresses one
+# block; recently read blocks are kept in a small LRU. File descriptors are opened on
+# demand and capped by an LRU of their own. Once enough small segments pile up,
+# compact() merges them into one; the merged files are renamed *.retired (readers
+# mid-export keep working) and deleted on the next compaction or restart.
+
+ARCHIVE_DIR = os.getenv("EPOCHPA_ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = float(os.getenv("EPOCHPA_ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_INTERVAL = float(os.getenv("EPOCHPA_ARCHIVE_INTERVAL_SECONDS", "3600"))
+BLOCK_RECORDS = int(os.getenv("EPOCHPA_ARCHIVE_BLOCK_RECORDS", "256"))
+BLOCK_CACHE = 64
+MAX_OPEN_SEGMENTS = int(os.getenv("EPOCHPA_ARCHIVE_MAX_OPEN_FILES", "32"))
+COMPACT_SEGMENTS = int(os.getenv("EPOCHPA_ARCHIVE_COMPACT_SEGMENTS", "8"))
+COMPACT_BELOW_RECORDS = int(os.getenv("EPOCHPA_ARCHIVE_COMPACT_BELOW_RECORDS", str(BLOCK_RECORDS * 16)))
+
+_MAGIC = b"EPAS"
+_FOOTER = struct.Struct("<Q4s")
+
+archive_reads = registry.counter(
+    "epochpa_archive_reads_total", "Archive lookups by result.", ("result",))
+
+
+def loads(line: bytes) -> dict:
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+class Segment:
+    """A segment's in-memory index; the file itself is only opened (via Archive) to read blocks."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            index_at, magic = _FOOTER.unpack(os.pread(fd, _FOOTER.size, size - _FOOTER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not an archive segment")
+            index = loads(os.pread(fd, size - _FOOTER.size - index_at, index_at))
+        finally:
+            os.close(fd)
+        self.first_ids = [entry[0] for entry in index]
+        # Segments written before last ids were indexed can only be bounded by the next block's first id
+        self.last_ids = [entry[4] if len(entry) > 4 else None for entry in index]
+        self.blocks = [(entry[1], entry[2]) for entry in index]
+        self.count = sum(entry[3] for entry in index)
+        self.min_id = self.first_ids[0] if index else None
+        self.max_id = self.last_ids[-1] if index else None
+
+    def may_contain(self, submission_id: str) -> bool:
+        if self.min_id is None or submission_id < self.min_id:
+            return False
+        return self.max_id is None or submission_id <= self.max_id
+
+    def block_for(self, submission_id: str) -> Optional[int]:
+        i = bisect_right(self.first_ids, submission_id) - 1
+        if i < 0:
+            return None
+        last = self.last_ids[i]
+        return i if last is None or submission_id <= last else None
+
+
+def write_segment(directory: str, records: List[dict], block_records: int = BLOCK_RECORDS) -> str:
+    """Write records (any order) as a new segment; returns its path. Written to a temp name, then renamed."""
+    os.makedirs(directory, exist_ok=True)
+    records = sorted(records, key=lambda r: r["id"])
+    name = f"seg-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{uuid.uuid4().hex[:8]}.pas"
+    path = os.path.join(directory, name)
+    index = []
+    with open(path + ".tmp", "wb") as f:
+        for start in range(0, len(records), block_records):
+            chunk = records[start:start + block_records]
+            block = zlib.compress(b"\n".join(dumps(r) for r in chunk), 6)
+            index.append([chunk[0]["id"], f.tell(), len(block), len(chunk), chunk[-1]["id"]])
+            f.write(block)
+        index_at = f.tell()
+        f.write(dumps(index))
+        f.write(_FOOTER.pack(index_at, _MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+    return path
+
+
+class Archive:
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.directory = directory
+        self._segments: List[Segment] = []     # oldest first
+        self._cache: "OrderedDict[Tuple[str, int], List[bytes]]" = OrderedDict()
+        self._fds: "OrderedDict[str, int]" = OrderedDict()      # segment name -> open fd, LRU
+        self._retired: List[str] = []
+        self._lock = threading.Lock()
+        self._fd_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".pas"):
+                    self._segments.append(Segment(os.path.join(directory, name)))
+                elif name.endswith(".retired"):
+                    os.unlink(os.path.join(directory, name))
+
+    def __len__(self) -> int:
+        return sum(seg.count for seg in self._segments)
+
+    def append(self, records: List[dict]):
+        if records:
+            segment = Segment(write_segment(self.directory, records))
+            with self._lock:
+                self._segments.append(segment)
+
+    def _read(self, segment: Segment, i: int) -> List[bytes]:
+        offset, length = segment.blocks[i]
+        # pread under the lock so an evicted fd can't be closed (and its number reused) mid-read
+        with self._fd_lock:
+            fd = self._fds.get(segment.name)
+            if fd is None:
+                fd = self._fds[segment.name] = os.open(segment.path, os.O_RDONLY)
+                if len(self._fds) > MAX_OPEN_SEGMENTS:
+                    os.close(self._fds.popitem(last=False)[1])
+            else:
+                self._fds.move_to_end(segment.name)
+            data = os.pread(fd, length, offset)
+        return zlib.decompress(data).split(b"\n")
+
+    def _block(self, segment: Segment, i: int) -> List[bytes]:
+        key = (segment.name, i)
+        with self._lock:
+            lines = self._cache.get(key)
+            if lines is not None:
+                self._cache.move_to_end(key)
+                return lines
+        lines = self._read(segment, i)
+        with self._lock:
+            self._cache[key] = lines
+            if len(self._cache) > BLOCK_CACHE:
+                self._cache.popitem(last=False)
+        return lines
+
+    def get(self, submission_id: str) -> Optional[dict]:
+        """The archived record, or None. Newest segments are checked first."""
+        needle = f'"id":"{submission_id}"'.encode()
+        for segment in reversed(self._segments):
+            if not segment.may_contain(submission_id):
+                continue
+            i = segment.block_for(submission_id)
+            if i is None:
+                continue
+            for line in self._block(segment, i):
+                if needle in line:
+                    record = loads(line)
+                    if record["id"] == submission_id:
+                        archive_reads.inc("hit")
+                        return record
+        archive_reads.inc("miss")
+        return None
+
+    def iter_lines(self) -> Iterator[bytes]:
+        """Every archived record as a JSON line, one block in memory at a time (bypasses the LRU)."""
+        for segment in list(self._segments):
+            yield from self.iter_segment(segment)
+
+    def compact(self) -> int:
+        """Merge small segments into one once COMPACT_SEGMENTS of them exist; returns how many were merged."""
+        with self._compact_lock:
+            for path in self._retired:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            self._retired = []
+            small = [seg for seg in list(self._segments) if seg.count < COMPACT_BELOW_RECORDS]
+            if len(small) < COMPACT_SEGMENTS:
+                return 0
+            records = {}
+            for segment in small:           # oldest first, so a newer copy of an id wins
+                for line in self.iter_segment(segment):
+                    record = loads(line)
+                    records[record["id"]] = record
+            merged = Segment(write_segment(self.directory, list(records.values())))
+            gone = {seg.name for seg in small}
+            with self._lock:
+                self._segments = [seg for seg in self._segments if seg.name not in gone] + [merged]
+                for key in [key for key in self._cache if key[0] in gone]:
+                    del self._cache[key]
+            with self._fd_lock:
+                for segment in small:
+                    fd = self._fds.pop(segment.name, None)
+                    if fd is not None:
+                        os.close(fd)
+                    segment.path = os.path.join(self.directory, segment.name + ".retired")
+                    os.replace(os.path.join(self.directory, segment.name), segment.path)
+                    self._retired.append(segment.path)
+            return len(small)
+
+    def iter_segment(self, segment: Segment) -> Iterator[bytes]:
+        for i in range(len(segment.blocks)):
+            yield from self._read(segment, i)
+
+
+_archive: Optional[Archive] = None
+_open_lock = threading.Lock()
+
+
+def archive() -> Archive:
+    """Opened on first use: reads only each segment's footer and sparse index."""
+    global _archive
+    if _archive is None:
+        with _open_lock:
+            if _archive is None:
+                _archive = Archive()
+    return _archive
+
+
+registry.gauge("epochpa_archived_submissions", "PAs held in the archive tier.",
+               lambda: len(_archive) if _archive is not None else 0)
@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# ========== WORKLOAD-AWARE REP ASSIGNMENT ==========
+# Reps live in min-heaps keyed by open workload: one global heap plus one heap
+# per payer / specialty tag. Workload changes push a fresh entry and leave the
+# old one behind (lazy deletion), so every pick or release is O(log reps).
+# Reps at their capacity cap are simply not re-pushed until work closes.
+# Affinity only wins while the matching rep is within AFFINITY_SLACK open PAs of
+# the least-loaded rep overall, so one popular payer can't pile up on one person.
+
+AFFINITY_SLACK = int(os.getenv("EPOCHPA_AFFINITY_SLACK", "3"))
+
+
+def _tag(kind: str, value: str) -> str:
+    return f"{kind}:{value.strip().lower()}"
+
+
+class RepState:
+    __slots__ = ("name", "load", "capacity", "tags", "active")
+
+    def __init__(self, name: str, capacity: Optional[int], tags: Set[str]):
+        self.name = name
+        self.load = 0
+        self.capacity = capacity
+        self.tags = tags
+        self.active = True
+
+    def has_room(self) -> bool:
+        return self.capacity is None or self.load < self.capacity
+
+
+class RepScheduler:
+    """Assigns new PAs to the least-loaded eligible rep, preferring payer, then specialty affinity."""
+
+    def __init__(self, affinity_slack: int = AFFINITY_SLACK):
+        self.affinity_slack = affinity_slack
+        self._lock = threading.Lock()
+        self._reps: Dict[str, RepState] = {}
+        self._heaps: Dict[str, List[Tuple[int, int, str]]] = {"*": []}
+        self._seq = itertools.count()
+
+    # ----- internal heap bookkeeping -----
+    def _push(self, rep: RepState):
+        if not rep.active or not rep.has_room():
+            return
+        if len(self._heaps["*"]) > 8 * len(self._reps) + 64:
+            self._compact()
+            return
+        entry = (rep.load, next(self._seq), rep.name)
+        heapq.heappush(self._heaps["*"], entry)
+        for tag in rep.tags:
+            heapq.heappush(self._heaps.setdefault(tag, []), entry)
+
+    def _valid(self, entry: Tuple[int, int, str]) -> Optional[RepState]:
+        rep = self._reps.get(entry[2])
+        if rep is None or not rep.active or rep.load != entry[0] or not rep.has_room():
+            return None
+        return rep
+
+    def _peek(self, heap_key: str) -> Optional[RepState]:
+        heap = self._heaps.get(heap_key)
+        while heap:
+            rep = self._valid(heap[0])
+            if rep is not None:
+                return rep
+            heapq.heappop(heap)  # stale entry
+        return None
+
+    def _compact(self):
+        # Rebuild every heap from live state; drops stale entries after bulk changes
+        self._heaps = {"*": []}
+        for rep in self._reps.values():
+            if rep.active and rep.has_room():
+                entry = (rep.load, next(self._seq), rep.name)
+                self._heaps["*"].append(entry)
+                for tag in rep.tags:
+                    self._heaps.setdefault(tag, []).append(entry)
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+
+    # ----- rep roster -----
+    def add_rep(self, name: str, capacity: Optional[int] = None,
+                payers: Iterable[str] = (), specialties: Iterable[str] = (), load: int = 0):
+        tags = {_tag("payer", p) for p in payers if p.strip()}
+        tags |= {_tag("service", s) for s in specialties if s.strip()}
+        with self._lock:
+            rep = self._reps.get(name)
+            if rep is None:
+                rep = self._reps[name] = RepState(name, capacity, tags)
+                rep.load = load
+            else:
+                rep.capacity, rep.tags, rep.active = capacity, tags, True
+            self._compact()
+
+    def remove_rep(self, name: str) -> bool:
+        with self._lock:
+            rep = self._reps.pop(name, None)
+            if rep is None:
+                return False
+            rep.active = False
+            self._compact()
+            return True
+
+    def has_rep(self, name: Optional[str]) -> bool:
+        return name is not None and name in self._reps
+
+    def reps(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "rep": r.name,
+                    "open": r.load,
+                    "capacity": r.capacity,
+                    "payers": sorted(t.split(":", 1)[1] for t in r.tags if t.startswith("payer:")),
+                    "specialties": sorted(t.split(":", 1)[1] for t in r.tags if t.startswith("service:")),
+                }
+                for r in sorted(self._reps.values(), key=lambda r: r.name)
+            ]
+
+    # ----- workload -----
+    def pick(self, insurance: Optional[str] = None, service: Optional[str] = None) -> Optional[str]:
+        """Choose a rep for a new PA and count it against their workload. None if nobody has room."""
+        with self._lock:
+            least = self._peek("*")
+            if least is None:
+                return None
+            rep = least
+            for heap_key in (_tag("payer", insurance) if insurance else None,
+                             _tag("service", service) if service else None):
+                candidate = self._peek(heap_key) if heap_key else None
+                if candidate is not None and candidate.load <= least.load + self.affinity_slack:
+                    rep = candidate
+                    break
+            rep.load += 1
+            self._push(rep)
+            return rep.name
+
+    def acquire(self, name: Optional[str]):
+        """Count a manually assigned PA against a rep (capacity is not enforced for manual overrides)."""
+        with self._lock:
+            rep = self._reps.get(name) if name else None
+            if rep is not None:
+                rep.load += 1
+                self._push(rep)
+
+    def release(self, name: Optional[str]):
+        """A PA left this rep's queue (finalized or reassigned)."""
+        with self._lock:
+            rep = self._reps.get(name) if name else None
+            if rep is not None and rep.load > 0:
+                rep.load -= 1
+                self._push(rep)
+
+    def target_load(self) -> float:
+        with self._lock:
+            active = [r for r in self._reps.values() if r.active]
+            if not active:
+                return 0.0
+            return sum(r.load for r in active) / len(active)
+
+    def load_of(self, name: Optional[str]) -> int:
+        rep = self._reps.get(name) if name else None
+        return rep.load if rep is not None else 0
+
+
+scheduler = RepScheduler()
@@ -1,18 +1,21 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, EmailStr
 from fastapi.responses import HTMLResponse
 from sqlmodel import Field, SQLModel, Session, create_engine, select
+from sqlalchemy import text
 import secrets
-import requests
 import os
 
-from dotenv import load_dotenv
-load_dotenv()
+from assignment import scheduler
+from circuit import availity_token_breaker
+from metrics import time_outbound
+from profiling import ProfiledRoute, span
+from ratelimit import acquire_availity, admission_control, issue_identity
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute, dependencies=[Depends(admission_control)])
 
 # ========== DATABASE SETUP ==========
-DB_FILE = "epochpa.db"
+DB_FILE = os.getenv("EPOCHPA_DB", "epochpa.db")
 engine = create_engine(f"sqlite:///{DB_FILE}", echo=False)
 
 class User(SQLModel, table=True):
@@ -23,20 +26,49 @@ class User(SQLModel, table=True):
     confirmed: bool = False
     confirmation_token: str | None = None
 
-SQLModel.metadata.create_all(engine)
+_db_initialized = False
+
+def init_db():
+    """Create tables if needed. Runs once at app startup instead of as an import side effect."""
+    global _db_initialized
+    if not _db_initialized:
+        SQLModel.metadata.create_all(engine)
+        _db_initialized = True
+
+def confirmed_users(role: str) -> list[str]:
+    """Emails of confirmed accounts with this role (e.g. to seed the rep pool at startup)."""
+    with Session(engine) as session:
+        return list(session.exec(select(User.email).where(User.role == role, User.confirmed == True)))  # noqa: E712
+
+def _activate(user: User):
+    if user.role == "rep" and not scheduler.has_rep(user.email):
+        scheduler.add_rep(user.email)
+
+def db_ready() -> bool:
+    """Cheap readiness probe: schema created and the database answers."""
+    if not _db_initialized:
+        return False
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
 
 # AVAILITY (leave as is)
 AVAILITY_CLIENT_ID = os.getenv("AVAILITY_KEY", "your_availity_client_id")
 AVAILITY_CLIENT_SECRET = os.getenv("AVAILITY_SECRET", "your_availity_client_secret")
-AVAILITY_TOKEN_URL = "https://api.availity.com/availity/v1/token"
+AVAILITY_TOKEN_URL = os.getenv("AVAILITY_TOKEN_URL", "https://api.availity.com/availity/v1/token")
 
 # === BREVO CONFIG ===
 BREVO_API_KEY = os.getenv("BREVO_API_KEY")
+BREVO_EMAIL_URL = os.getenv("BREVO_EMAIL_URL", "https://api.brevo.com/v3/smtp/email")
 EMAIL_FROM = "leland.paul@epochpa.com"
 
 def send_email_brevo(recipient, subject, html_content, text_content=None):
+    import requests  # deferred: keeps app import (cold start) light
     api_key = BREVO_API_KEY
-    url = "https://api.brevo.com/v3/smtp/email"
+    url = BREVO_EMAIL_URL
     payload = {
         "sender": {"name": "EpochPA", "email": EMAIL_FROM},
         "to": [{"email": recipient}],
@@ -51,7 +83,10 @@ def send_email_brevo(recipient, subject, html_content, text_content=None):
         "accept": "application/json"
     }
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        with span("brevo.email"), time_outbound("brevo_email") as call:
+            response = requests.post(url, json=payload, headers=headers)
+            if response.status_code not in (200, 201, 202):
+                call["outcome"] = "error"
         return response.status_code in (200, 201, 202)
     except Exception as e:
         print("Brevo error:", str(e))
@@ -128,6 +163,7 @@ def confirm_email(token: str = Query(...)):
         user.confirmation_token = None
         session.add(user)
         session.commit()
+        _activate(user)
         return """
         <html>
             <head><title>EpochPA – Email Confirmed</title></head>
@@ -148,6 +184,7 @@ def confirm_post(req: ConfirmRequest):
         user.confirmation_token = None
         session.add(user)
         session.commit()
+        _activate(user)
         return {"message": "Email confirmed! You can now log in."}
 
 @router.post("/auth/login")
@@ -164,13 +201,28 @@ def login(req: LoginRequest):
                 print("LOGIN NOT CONFIRMED for:", req.email)  # Debug print
                 raise HTTPException(403, "Email not confirmed.")
             # Get Availity OAuth2 token (leave as-is for now)
+            import requests  # deferred: keeps app import (cold start) light
+            if not availity_token_breaker.allow():
+                raise HTTPException(503, "Availity is unavailable; please retry shortly.",
+                                    headers={"Retry-After": str(availity_token_breaker.retry_after())})
+            if not acquire_availity():
+                availity_token_breaker.cancel()
+                raise HTTPException(503, "Availity is busy; please retry shortly.", headers={"Retry-After": "5"})
             data = {
                 "grant_type": "client_credentials",
                 "client_id": AVAILITY_CLIENT_ID,
                 "client_secret": AVAILITY_CLIENT_SECRET,
                 "scope": "hipaa"
             }
-            resp = requests.post(AVAILITY_TOKEN_URL, data=data)
+            try:
+                with span("availity.token"), time_outbound("availity_token") as call:
+                    resp = requests.post(AVAILITY_TOKEN_URL, data=data, timeout=availity_token_breaker.timeout)
+                    if resp.status_code != 200:
+                        call["outcome"] = "error"
+            except requests.RequestException as e:
+                availity_token_breaker.record(False)
+                raise HTTPException(503, f"Availity token request failed: {e}")
+            availity_token_breaker.record(resp.status_code < 500 and resp.status_code != 429)
             if resp.status_code != 200:
                 print("AVAILITY TOKEN FAILED:", resp.text)  # Debug print
                 raise HTTPException(500, f"Failed to get Availity token: {resp.text}")
@@ -181,7 +233,8 @@ def login(req: LoginRequest):
                     "email": req.email,
                     "role": user.role
                 },
-                "availity_access_token": availity_token
+                "availity_access_token": availity_token,
+                "identity_token": issue_identity(user.email)
             }
     except Exception as e:
         print("EXCEPTION DURING LOGIN:", repr(e))  # Exception print
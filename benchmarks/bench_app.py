@@ -0,0 +1,64 @@
+"""
+Benchmark entry point for uvicorn: the real app from main.py, pre-seeded with a
+synthetic store of BENCH_STORE_SIZE PAs, BENCH_REPS reps and a confirmed login user.
+
+    BENCH_STORE_SIZE=100000 uvicorn benchmarks.bench_app:app --port 8100
+"""
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, select
+
+import auth
+import pa
+from assignment import scheduler
+from payers import resolve_payer
+from records import Submission
+from main import app  # noqa: F401  (re-exported for uvicorn)
+from benchmarks.workload import (
+    BENCH_PASSWORD, BENCH_USER, NUM_REPS, PAYERS, STATUSES, rep_name, synthetic_request,
+)
+
+STORE_SIZE = int(os.getenv("BENCH_STORE_SIZE", "1000"))
+
+
+def seed_store(size: int, seed: int = 1234):
+    rng = random.Random(seed)
+    for i in range(NUM_REPS):
+        payer = PAYERS[i % len(PAYERS)]
+        scheduler.add_rep(rep_name(i), payers=[resolve_payer(payer) or payer])
+    start = datetime.utcnow() - timedelta(days=90)
+    for _ in range(size):
+        data = synthetic_request(rng)
+        created = start + timedelta(seconds=rng.randrange(90 * 86400))
+        status = rng.choice(STATUSES)
+        history = [{"status": "Submitted", "timestamp": created.isoformat() + "Z"}]
+        if status != "Submitted":
+            history.append({"status": status, "timestamp": (created + timedelta(hours=rng.randrange(1, 96))).isoformat() + "Z"})
+        data.update({
+            "id": str(uuid.uuid4()),
+            "payer_id": resolve_payer(data["insurance"]),
+            "status": status,
+            "status_history": history,
+            "eligibility_response": "No Availity token provided. Skipped eligibility check.",
+        })
+        s = Submission.from_dict(data)
+        if status not in pa.FINAL_STATUSES:
+            s.set_rep(scheduler.pick(pa._payer_key(s), s.service))
+        else:
+            s.set_rep(rep_name(rng.randrange(NUM_REPS)))
+        pa._store(s)
+
+
+def seed_user():
+    with Session(auth.engine) as session:
+        if session.exec(select(auth.User).where(auth.User.email == BENCH_USER)).first() is None:
+            session.add(auth.User(email=BENCH_USER, password=BENCH_PASSWORD, role="provider", confirmed=True))
+            session.commit()
+
+
+seed_store(STORE_SIZE)
+auth.init_db()
+seed_user()
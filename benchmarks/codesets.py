@@ -0,0 +1,102 @@
+"""
+Startup, lookup and memory cost of the code-set tables.
+
+Generates an ICD-10-CM-sized synthetic table (default 75k codes) plus a procedure
+table, then reports compile time, open time, membership / prefix lookup latency and
+RSS growth for the memory-mapped CodeSet versus loading the same table into a dict.
+
+    python -m benchmarks.codesets --codes 75000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import string
+import tempfile
+import time
+
+from codesets import CodeSet, compile_codeset
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # not Linux: peak RSS is the best available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def write_icd10(path: str, count: int, rng: random.Random) -> list:
+    codes = set()
+    while len(codes) < count:
+        codes.add(rng.choice(string.ascii_uppercase) + f"{rng.randrange(100):02d}"
+                  + "".join(rng.choice(string.digits + "X") for _ in range(rng.randint(0, 4))))
+    codes = sorted(codes)
+    with open(path, "w") as f:
+        for code in codes:
+            words = " ".join(rng.choice(("Pain", "of", "left", "right", "unspecified", "chronic", "joint",
+                                         "disorder", "with", "without", "complication")) for _ in range(8))
+            f.write(f"{code:<8}{words}\n")
+    return codes
+
+
+def per_call_us(fn, keys) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return round((time.perf_counter() - start) / len(keys) * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codes", type=int, default=75000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "icd10cm.txt")
+        codes = write_icd10(source, args.codes, rng)
+        hits = [rng.choice(codes) for _ in range(args.lookups)]
+        misses = [c + "Z" for c in hits]
+        prefixes = [c[:3] for c in hits]
+
+        start = time.perf_counter()
+        compile_codeset(source, os.path.join(tmp, "icd10cm.bin"))
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        gc.collect()
+        before = rss_bytes()
+        start = time.perf_counter()
+        table = CodeSet.open("icd10cm", tmp)
+        open_ms = (time.perf_counter() - start) * 1000
+        mapped = {
+            "open_ms": round(open_ms, 3),
+            "contains_hit_us": per_call_us(table.__contains__, hits),
+            "contains_miss_us": per_call_us(table.__contains__, misses),
+            "prefix10_us": per_call_us(lambda p: table.prefix(p, 10), prefixes[:2000]),
+            "rss_growth_bytes": rss_bytes() - before,    # after touching pages with lookups
+            "file_bytes": os.path.getsize(os.path.join(tmp, "icd10cm.bin")),
+        }
+        table.close()
+
+        gc.collect()
+        before = rss_bytes()
+        start = time.perf_counter()
+        with open(source) as f:
+            as_dict = {line[:8].strip(): line[8:].strip() for line in f}
+        load_ms = (time.perf_counter() - start) * 1000
+        in_memory = {
+            "load_ms": round(load_ms, 3),
+            "contains_hit_us": per_call_us(as_dict.__contains__, hits),
+            "rss_growth_bytes": rss_bytes() - before,
+        }
+
+    print(json.dumps({"codes": args.codes, "compile_ms": round(compile_ms, 1),
+                      "mmap": mapped, "dict": in_memory}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Reproducible load test for the EpochPA API.
+
+Starts the Availity/Brevo stubs, then for each store size boots the app
+(benchmarks.bench_app under uvicorn) against them, replays a weighted mix of
+provider, rep and admin traffic, and reports throughput plus p50/p99 per route.
+
+    python -m benchmarks.loadtest --sizes 1000,10000,100000 --duration 20 --output bench.json
+    python -m benchmarks.loadtest --sizes 1000 --baseline bench.json   # exits 1 on regression
+
+Results are JSON so runs can be diffed or compared against a saved baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmarks.stubs import StubConfig, start_stub_server, stub_env
+from benchmarks.workload import (
+    BENCH_PASSWORD, BENCH_USER, NUM_PROVIDERS, NUM_REPS, provider_npi, rep_name, synthetic_request,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Route weights per persona; a persona's share of virtual users comes from --mix
+PERSONAS = {
+    "provider": {"submit": 5, "list_provider": 4, "login": 1, "register": 0.2},
+    "rep": {"list_rep": 4, "get": 3, "update_status": 3},
+    "admin": {"list_all": 1, "assign_rep": 2, "get": 2, "latency": 1},
+}
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, base: str, persona: str, rng: random.Random, deadline: float, recorder: "Recorder", known_ids: List[str]):
+        super().__init__(daemon=True)
+        self.base = base
+        self.persona = persona
+        self.rng = rng
+        self.deadline = deadline
+        self.recorder = recorder
+        self.known_ids = known_ids
+        self.session = requests.Session()
+        routes = PERSONAS[persona]
+        self.routes = list(routes)
+        self.weights = list(routes.values())
+
+    def _pick_id(self) -> Optional[str]:
+        return self.rng.choice(self.known_ids) if self.known_ids else None
+
+    def _call(self, route: str):
+        rng = self.rng
+        if route == "submit":
+            return self.session.post(f"{self.base}/submit", json=synthetic_request(rng),
+                                     headers={"Authorization": "Bearer stub-token"})
+        if route == "list_provider":
+            return self.session.get(f"{self.base}/list", params={"provider_npi": provider_npi(rng.randrange(NUM_PROVIDERS))})
+        if route == "list_rep":
+            return self.session.get(f"{self.base}/list", params={"assigned_rep": rep_name(rng.randrange(NUM_REPS))})
+        if route == "list_all":
+            return self.session.get(f"{self.base}/list")
+        if route == "login":
+            return self.session.post(f"{self.base}/auth/login", json={
+                "email": BENCH_USER,
+                "password": BENCH_PASSWORD,
+            })
+        if route == "register":
+            return self.session.post(f"{self.base}/auth/register", json={
+                "email": f"bench-{rng.getrandbits(64):x}@example.com", "password": "x", "role": "provider",
+            })
+        if route == "get":
+            return self.session.get(f"{self.base}/get", params={"submission_id": self._pick_id()})
+        if route == "update_status":
+            return self.session.post(f"{self.base}/update-status", data={
+                "submission_id": self._pick_id(), "new_status": rng.choice(["In Review", "Approved", "Denied"]),
+            })
+        if route == "assign_rep":
+            return self.session.post(f"{self.base}/assign-rep", data={
+                "submission_id": self._pick_id(), "assigned_rep": rep_name(rng.randrange(NUM_REPS)),
+            })
+        if route == "latency":
+            return self.session.get(f"{self.base}/latency", params={"dimension": "insurance"})
+        raise ValueError(route)
+
+    def run(self):
+        while time.perf_counter() < self.deadline:
+            route = self.rng.choices(self.routes, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                resp = self._call(route)
+                ok = resp.status_code < 500
+                if route == "submit" and resp.status_code == 201:
+                    self.known_ids.append(resp.json()["data"]["id"])
+            except requests.RequestException:
+                ok = False
+            self.recorder.record(route, time.perf_counter() - start, ok)
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, route: str, seconds: float, ok: bool):
+        with self.lock:
+            self.samples.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        everything = []
+        for route, samples in sorted(self.samples.items()):
+            everything.extend(samples)
+            routes[route] = {
+                "count": len(samples),
+                "errors": self.errors.get(route, 0),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+            }
+        total = {
+            "count": len(everything),
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(len(everything) / elapsed, 2),
+            "p50_ms": round((percentile(everything, 0.50) or 0) * 1000, 3),
+            "p99_ms": round((percentile(everything, 0.99) or 0) * 1000, 3),
+        }
+        return {"routes": routes, "total": total}
+
+
+def wait_until_up(base_url: str, proc: subprocess.Popen, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError("API process exited during startup")
+        try:
+            if requests.get(f"{base_url}/readyz", timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"API not ready after {timeout}s")
+
+
+def run_size(size: int, args, env: dict) -> dict:
+    port = args.port
+    env = dict(env, BENCH_STORE_SIZE=str(size), EPOCHPA_DB=os.path.join(args.workdir, f"bench_{size}.db"))
+    cmd = [sys.executable, "-m", "uvicorn", "benchmarks.bench_app:app",
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    host = f"http://127.0.0.1:{port}"
+    try:
+        startup = wait_until_up(host, proc, args.startup_timeout)
+        base = f"{host}/intake"
+        # Sample real IDs so /get, /update-status and /assign-rep hit existing PAs
+        listing = requests.get(f"{base}/list", params={"assigned_rep": "rep000@example.com"}).json()["submissions"]
+        known_ids = [s["id"] for s in listing[:1000]]
+        rng = random.Random(args.seed)
+        mix = {k: float(v) for k, v in (p.split("=") for p in args.mix.split(","))}
+        personas = rng.choices(list(mix), list(mix.values()), k=args.users)
+        recorder = Recorder()
+        deadline = time.perf_counter() + args.duration
+        users = [VirtualUser(base, p, random.Random(rng.random()), deadline, recorder, known_ids) for p in personas]
+        started = time.perf_counter()
+        for u in users:
+            u.start()
+        for u in users:
+            u.join()
+        elapsed = time.perf_counter() - started
+        result = {"store_size": size, "startup_seconds": round(startup, 3), "elapsed_seconds": round(elapsed, 3)}
+        result.update(recorder.report(elapsed))
+        return result
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """List human-readable regressions (p99 up or throughput down by more than `tolerance`)."""
+    problems = []
+    base_by_size = {r["store_size"]: r for r in baseline.get("results", [])}
+    for run in results["results"]:
+        base = base_by_size.get(run["store_size"])
+        if base is None:
+            continue
+        for route, stats in run["routes"].items():
+            ref = base["routes"].get(route)
+            if not ref:
+                continue
+            if ref["p99_ms"] and stats["p99_ms"] > ref["p99_ms"] * (1 + tolerance):
+                problems.append(f"{run['store_size']} {route}: p99 {ref['p99_ms']}ms -> {stats['p99_ms']}ms")
+            if ref["throughput_rps"] and stats["throughput_rps"] < ref["throughput_rps"] * (1 - tolerance):
+                problems.append(f"{run['store_size']} {route}: throughput {ref['throughput_rps']} -> {stats['throughput_rps']} rps")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="comma-separated store sizes")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of traffic per store size")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--mix", default="provider=6,rep=3,admin=1", help="persona weights")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub upstream mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub upstream error rate (0-1)")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--workdir", default=os.path.join(ROOT, ".bench"))
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="compare against a previous JSON result; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="leave the app's admission control on (all virtual users share one IP)")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    stub, stub_config = start_stub_server(config=StubConfig(args.latency_ms, args.jitter_ms, args.error_rate))
+    env = dict(os.environ, **stub_env(stub))
+    if not args.keep_rate_limits:
+        for name in ("SUBMIT", "LIST", "DEFAULT", "AVAILITY"):
+            env.setdefault(f"EPOCHPA_RATELIMIT_{name}", "1000000/1000000")
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "duration": args.duration,
+            "users": args.users,
+            "mix": args.mix,
+            "stub": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate},
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": [],
+    }
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"store size {size}...", file=sys.stderr)
+        results["results"].append(run_size(size, args, env))
+    results["meta"]["stub_calls"] = dict(stub_config.calls)
+    stub.shutdown()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for p in problems:
+            print("REGRESSION:", p, file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
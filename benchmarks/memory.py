@@ -0,0 +1,80 @@
+"""
+Bytes per PA in the in-memory store: the old dict-per-submission shape versus
+records.Submission, measured with tracemalloc over a synthetic store.
+
+    python -m benchmarks.memory --size 200000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.workload import NUM_REPS, STATUSES, rep_name, synthetic_request
+from records import Submission
+
+
+def build_dicts(size: int, seed: int = 3) -> list:
+    """PAs exactly as /submit used to store them (one dict per PA, one dict per history entry)."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    subs = []
+    for _ in range(size):
+        data = synthetic_request(rng)
+        created = start + timedelta(seconds=rng.randrange(90 * 86400), microseconds=rng.randrange(10 ** 6))
+        status = rng.choice(STATUSES)
+        history = [{"status": "Submitted", "timestamp": created.isoformat() + "Z"}]
+        if status != "Submitted":
+            history.append({"status": status, "timestamp": (created + timedelta(hours=rng.randrange(1, 96))).isoformat() + "Z"})
+        data.update({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "possible_duplicate_of": None,
+            "status": status,
+            "status_history": history,
+            "documents": [],
+            "code_warnings": [],
+            "payer_id": None,
+            "assigned_rep": rep_name(rng.randrange(NUM_REPS)),
+            "eligibility_response": "No Availity token provided. Skipped eligibility check.",
+            "version": 1,
+            "updated_at": history[-1]["timestamp"],
+        })
+        subs.append(data)
+    return subs
+
+
+def measure(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return store, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100000)
+    args = parser.parse_args()
+
+    dicts, dict_bytes = measure(lambda: build_dicts(args.size))
+    # Same data converted to records; the intermediate dicts are freed, the strings records keep are counted
+    records, record_bytes = measure(lambda: [Submission.from_dict(d) for d in build_dicts(args.size)])
+    for r, d in zip(records[:100], dicts[:100]):
+        assert r.to_dict() == d, "records must round-trip to the API shape"
+    print(json.dumps({
+        "submissions": args.size,
+        "bytes_per_pa": {
+            "dict": round(dict_bytes / args.size),
+            "record": round(record_bytes / args.size),
+        },
+        "reduction": round(1 - record_bytes / dict_bytes, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Serialization and bytes-on-the-wire benchmark for a large /list payload.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps, as JSONResponse does)
+with FastJSONResponse, and reports gzip / brotli sizes for the rendered body.
+
+    python -m benchmarks.serialization --size 10000
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.workload import STATUSES, rep_name, synthetic_request
+from compression import BROTLI_QUALITY, GZIP_LEVEL, brotli
+from serialization import dumps, orjson
+
+
+def build_submissions(size: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=30)
+    subs = []
+    for i in range(size):
+        data = synthetic_request(rng)
+        created = start + timedelta(seconds=rng.randrange(30 * 86400))
+        status = rng.choice(STATUSES)
+        history = [{"status": "Submitted", "timestamp": created.isoformat() + "Z"}]
+        if status != "Submitted":
+            history.append({"status": status, "timestamp": (created + timedelta(hours=rng.randrange(1, 72))).isoformat() + "Z"})
+        data.update({
+            "id": str(uuid.uuid4()),
+            "status": status,
+            "status_history": history,
+            "documents": [],
+            "assigned_rep": rep_name(rng.randrange(25)),
+            "eligibility_response": {"coverages": [{"memberId": data["member_id"], "status": "Active Coverage"}]},
+            "version": rng.randint(1, 5),
+            "updated_at": history[-1]["timestamp"],
+        })
+        subs.append(data)
+    return subs
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def default_render(payload) -> bytes:
+    # What fastapi.responses.JSONResponse does for a dict returned from a route
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = {"submissions": build_submissions(args.size)}
+    default_body = default_render(payload)
+    fast_body = dumps(payload)
+    results = {
+        "submissions": args.size,
+        "orjson": orjson is not None,
+        "serialize_ms": {
+            "default": round(best_of(lambda: default_render(payload), args.repeat) * 1000, 2),
+            "fast": round(best_of(lambda: dumps(payload), args.repeat) * 1000, 2),
+        },
+        "bytes": {
+            "default": len(default_body),
+            "fast": len(fast_body),
+            "gzip": len(gzip.compress(fast_body, GZIP_LEVEL)),
+        },
+        "compress_ms": {
+            "gzip": round(best_of(lambda: gzip.compress(fast_body, GZIP_LEVEL), args.repeat) * 1000, 2),
+        },
+    }
+    if brotli is not None:
+        results["bytes"]["br"] = len(brotli.compress(fast_body, quality=BROTLI_QUALITY))
+        results["compress_ms"]["br"] = round(best_of(lambda: brotli.compress(fast_body, quality=BROTLI_QUALITY), args.repeat) * 1000, 2)
+    results["speedup"] = round(results["serialize_ms"]["default"] / max(results["serialize_ms"]["fast"], 1e-6), 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
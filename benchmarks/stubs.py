@@ -0,0 +1,127 @@
+"""
+Local stand-ins for the Availity token / coverages endpoints and the Brevo email API.
+
+Latency (mean + jitter) and error rate are configurable so load tests can model a
+healthy or a degraded upstream without touching the real services.
+
+    python -m benchmarks.stubs --port 9100 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 20.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = {"token": 0, "coverages": 0, "email": 0}
+        self.lock = threading.Lock()
+
+
+def _make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _delay(self):
+            delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+            time.sleep(delay)
+
+        def _send(self, status: int, body: dict):
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _count(self, name: str):
+            with config.lock:
+                config.calls[name] += 1
+
+        def _fail(self) -> bool:
+            if random.random() < config.error_rate:
+                self._send(503, {"error": "stub upstream failure"})
+                return True
+            return False
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            path = urlparse(self.path).path
+            self._delay()
+            if path == "/availity/v1/token":
+                self._count("token")
+                if not self._fail():
+                    self._send(200, {"access_token": "stub-token", "token_type": "Bearer", "expires_in": 300})
+            elif path == "/v3/smtp/email":
+                self._count("email")
+                if not self._fail():
+                    self._send(201, {"messageId": f"<stub-{random.getrandbits(48):x}@brevo>"})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            self._delay()
+            if url.path == "/availity/v1/coverages":
+                self._count("coverages")
+                if not self._fail():
+                    params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                    self._send(200, {
+                        "totalCount": 1,
+                        "coverages": [{
+                            "memberId": params.get("memberId"),
+                            "payerId": params.get("payerId"),
+                            "status": "Active Coverage",
+                            "statusCode": "4",
+                        }],
+                    })
+            else:
+                self._send(404, {"error": "not found"})
+
+    return Handler
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, config: StubConfig = None):
+    """Start the stub server on a background thread; returns (server, config)."""
+    config = config or StubConfig()
+    server = ThreadingHTTPServer((host, port), _make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config
+
+
+def stub_env(server) -> dict:
+    """Environment variables that point the app's outbound calls at the stub server."""
+    base = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    return {
+        "AVAILITY_TOKEN_URL": f"{base}/availity/v1/token",
+        "AVAILITY_COVERAGES_URL": f"{base}/availity/v1/coverages",
+        "BREVO_EMAIL_URL": f"{base}/v3/smtp/email",
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Availity/Brevo stub servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server, _ = start_stub_server(args.host, args.port, StubConfig(args.latency_ms, args.jitter_ms, args.error_rate))
+    for key, value in stub_env(server).items():
+        print(f"{key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,34 @@
+"""Synthetic PA traffic shared by the seeded benchmark app and the load generator."""
+import os
+import random
+
+NUM_REPS = int(os.getenv("BENCH_REPS", "25"))
+NUM_PROVIDERS = int(os.getenv("BENCH_PROVIDERS", "200"))
+BENCH_USER = os.getenv("BENCH_USER", "bench-provider@example.com")
+BENCH_PASSWORD = os.getenv("BENCH_PASSWORD", "bench-password")
+
+PAYERS = ["AETNA", "BCBS", "CIGNA", "HUMANA", "UHC", "MEDICARE", "MEDICAID"]
+SERVICES = ["MRI Lumbar Spine", "CT Head", "Physical Therapy", "Sleep Study", "Knee Arthroscopy", "Infusion"]
+DIAGNOSES = ["M54.5", "G43.909", "M17.11", "G47.33", "C50.911", "R51.9"]
+STATUSES = ["Submitted", "In Review", "Approved", "Denied"]
+
+
+def rep_name(i: int) -> str:
+    return f"rep{i:03d}@example.com"
+
+
+def provider_npi(i: int) -> str:
+    return f"{1000000000 + i}"
+
+
+def synthetic_request(rng: random.Random) -> dict:
+    return {
+        "provider_npi": provider_npi(rng.randrange(NUM_PROVIDERS)),
+        "patient_name": f"Patient {rng.randrange(10**6)}",
+        "patient_dob": f"19{rng.randint(30, 99)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "insurance": rng.choice(PAYERS),
+        "member_id": f"M{rng.randrange(10**9):09d}",
+        "service": rng.choice(SERVICES),
+        "diagnosis_code": rng.choice(DIAGNOSES),
+        "notes": None,
+    }
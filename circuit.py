@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from metrics import registry
+
+# ========== CIRCUIT BREAKERS ==========
+# Wraps calls to a flaky upstream (Availity). Outcomes land in a rolling window of
+# one-second buckets; once enough calls have been seen and the failure rate
+# crosses the threshold, the breaker opens and calls are refused in microseconds.
+# After a cool-down it goes half-open and lets a few probes through: success
+# closes it, failure re-opens it.
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+short_circuited = registry.counter(
+    "epochpa_circuit_short_circuited_total", "Calls refused because a circuit breaker was open.", ("breaker",))
+stale_served = registry.counter(
+    "epochpa_stale_fallback_total", "Last known-good results served while the upstream was unavailable.", ("breaker",))
+
+_breakers: Dict[str, "CircuitBreaker"] = {}
+registry.gauge("epochpa_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open).",
+               lambda: {name: _STATE_VALUE[b.state] for name, b in _breakers.items()}, ("breaker",))
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 10, window: int = 30,
+                 open_seconds: float = 30.0, half_open_probes: int = 1, timeout: float = 5.0):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.timeout = timeout              # per-call budget callers should pass to requests
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._buckets = [[0, 0, 0] for _ in range(window)]  # [second, successes, failures]
+        self._lock = threading.Lock()
+        _breakers[name] = self
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "CircuitBreaker":
+        prefix = f"EPOCHPA_BREAKER_{name.upper()}_"
+        for key, cast in (("failure_rate", float), ("min_calls", int), ("window", int),
+                          ("open_seconds", float), ("half_open_probes", int), ("timeout", float)):
+            value = os.getenv(prefix + key.upper())
+            if value is not None:
+                defaults[key] = cast(value)
+        return cls(name, **defaults)
+
+    def _window_counts(self, now: int) -> Tuple[int, int]:
+        ok = failed = 0
+        for second, s, f in self._buckets:
+            if now - second < self.window:
+                ok += s
+                failed += f
+        return ok, failed
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. Refusals are counted and cost no I/O."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    short_circuited.inc(self.name)
+                    return False
+                self.state, self._probes = HALF_OPEN, 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    short_circuited.inc(self.name)
+                    return False
+                self._probes += 1
+            return True
+
+    def cancel(self):
+        """Give back a slot taken by allow() when the call never went out (e.g. no quota)."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record(self, success: bool):
+        now = int(time.monotonic())
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if success:
+                    self.state = CLOSED
+                    self._buckets = [[0, 0, 0] for _ in range(self.window)]
+                else:
+                    self.state, self._opened_at = OPEN, time.monotonic()
+                return
+            bucket = self._buckets[now % self.window]
+            if bucket[0] != now:
+                bucket[:] = [now, 0, 0]
+            bucket[1 if success else 2] += 1
+            ok, failed = self._window_counts(now)
+            total = ok + failed
+            if self.state == CLOSED and total >= self.min_calls and failed / total >= self.failure_rate:
+                self.state, self._opened_at = OPEN, time.monotonic()
+
+    def retry_after(self) -> int:
+        return max(1, int(self.open_seconds - (time.monotonic() - self._opened_at)))
+
+
+class LastKnownGood:
+    """Bounded LRU of the last successful result per key, served (marked stale) when the breaker is open."""
+
+    def __init__(self, max_items: int = 100_000, max_age: float = 7 * 86400):
+        self.max_items = max_items
+        self.max_age = max_age
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._items[key] = (time.time(), value)
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or time.time() - item[0] > self.max_age:
+                return None
+            return item
+
+
+availity_token_breaker = CircuitBreaker.from_env("availity_token", timeout=5.0)
+availity_coverage_breaker = CircuitBreaker.from_env("availity_coverages", timeout=5.0)
@@ -0,0 +1,209 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Dict, List, Optional
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+
+from profiling import ProfiledRoute
+from ratelimit import admission_control
+from serialization import FastJSONResponse
+
+router = APIRouter(route_class=ProfiledRoute, default_response_class=FastJSONResponse, dependencies=[Depends(admission_control)])
+
+# ========== CODE SETS (ICD-10-CM / CPT-HCPCS) ==========
+# Source tables are plain text, one "CODE  description" per line (the CMS
+# icd10cm-codes-YYYY.txt layout). On first use each table is compiled once into
+# a binary file next to it and memory-mapped:
+#
+#   header   b"EPCS" | version u32 | count u32 | width u32
+#   codes    count x width bytes, sorted, space padded
+#   offsets  (count + 1) x u32 into the description blob
+#   blob     UTF-8 descriptions
+#
+# Lookups bisect the mmap directly: O(log n) membership and prefix queries, no
+# per-code Python objects, and pages are shared between workers via the page cache.
+# A table whose source file is absent is simply not validated.
+
+CODESET_DIR = os.getenv("EPOCHPA_CODESET_DIR", os.path.join(os.path.dirname(__file__), "data", "codesets"))
+CODE_VALIDATION = os.getenv("EPOCHPA_CODE_VALIDATION", "warn").lower()   # warn | strict | off
+CODESETS = ("icd10cm", "procedures")
+
+_MAGIC = b"EPCS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sIII")
+_OFFSET = struct.Struct("<I")
+
+# Shape checks apply even without tables loaded
+ICD10_PATTERN = re.compile(r"^[A-Z][0-9][0-9A-Z][0-9A-Z]{0,4}$")
+PROCEDURE_PATTERN = re.compile(r"^(\d{5}|\d{4}[FTU]|[A-V]\d{4})$")   # CPT, CPT cat. II/III, HCPCS II
+
+
+def normalize_code(code: Optional[str]) -> str:
+    """'m54.50 ' -> 'M5450': tables store codes without the dot."""
+    return (code or "").strip().upper().replace(".", "")
+
+
+def compile_codeset(source: str, target: str) -> int:
+    """Compile a text code table into the sorted fixed-width binary format. Returns the code count."""
+    rows: Dict[str, str] = {}
+    with open(source, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.strip().split(None, 1)
+            if not parts or parts[0].startswith("#"):
+                continue
+            rows[normalize_code(parts[0])] = parts[1].strip() if len(parts) > 1 else ""
+    codes = sorted(rows)
+    width = max((len(c) for c in codes), default=1)
+    blob = bytearray()
+    offsets = []
+    for code in codes:
+        offsets.append(len(blob))
+        blob += rows[code].encode("utf-8")
+    offsets.append(len(blob))
+    # Unique temp file per compile: several workers may compile the same table at startup
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(target) + ".", suffix=".tmp", dir=os.path.dirname(target) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(codes), width))
+            f.write(b"".join(c.encode("ascii", "replace").ljust(width) for c in codes))
+            f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            f.write(blob)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return len(codes)
+
+
+class CodeSet:
+    """A read-only, memory-mapped sorted code table."""
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.width = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a compiled code set")
+        self._codes_at = _HEADER.size
+        self._offsets_at = self._codes_at + self.count * self.width
+        self._blob_at = self._offsets_at + (self.count + 1) * _OFFSET.size
+
+    @classmethod
+    def open(cls, name: str, directory: str = CODESET_DIR) -> Optional["CodeSet"]:
+        """Open <name>.bin, (re)compiling it from <name>.txt if that is newer. None if there is no source."""
+        source = os.path.join(directory, f"{name}.txt")
+        target = os.path.join(directory, f"{name}.bin")
+        if os.path.exists(source) and (
+            not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+        ):
+            compile_codeset(source, target)
+        if not os.path.exists(target):
+            return None
+        return cls(name, target)
+
+    def _code(self, i: int) -> bytes:
+        start = self._codes_at + i * self.width
+        return self._mm[start:start + self.width].rstrip(b" ")
+
+    def description(self, i: int) -> str:
+        start, end = struct.unpack_from("<II", self._mm, self._offsets_at + i * _OFFSET.size)
+        return self._mm[self._blob_at + start:self._blob_at + end].decode("utf-8")
+
+    def _bisect(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._code(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __contains__(self, code: str) -> bool:
+        key = normalize_code(code).encode("ascii", "replace")
+        if not key or len(key) > self.width:
+            return False
+        i = self._bisect(key)
+        return i < self.count and self._code(i) == key
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[dict]:
+        key = normalize_code(prefix).encode("ascii", "replace")
+        out = []
+        i = self._bisect(key)
+        while i < self.count and len(out) < limit:
+            code = self._code(i)
+            if not code.startswith(key):
+                break
+            out.append({"code": code.decode("ascii"), "description": self.description(i)})
+            i += 1
+        return out
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+_codesets: Dict[str, Optional[CodeSet]] = {}
+_load_lock = threading.Lock()
+
+
+def codeset(name: str) -> Optional[CodeSet]:
+    """Opened on first use; None if the table isn't installed."""
+    if name not in _codesets:
+        with _load_lock:
+            if name not in _codesets:
+                try:
+                    _codesets[name] = CodeSet.open(name)
+                except (OSError, ValueError) as e:
+                    print(f"CODESET {name} unavailable:", e, file=sys.stderr)
+                    _codesets[name] = None
+    return _codesets[name]
+
+
+def _check(field: str, value: str, pattern, table: str, label: str) -> Optional[dict]:
+    code = normalize_code(value)
+    if not pattern.match(code):
+        return {"field": field, "code": value, "message": f"Not a valid {label} code format."}
+    codes = codeset(table)
+    if codes is not None and code not in codes:
+        # Usually a non-billable parent code (e.g. M54.5 -> M54.50); offer its children
+        return {"field": field, "code": value, "message": f"Unknown or non-billable {label} code.",
+                "suggestions": codes.prefix(code, 5)}
+    return None
+
+
+def validate_codes(diagnosis_code: str, service: str) -> List[dict]:
+    """Code-set problems in a PA request. `service` is only checked when it looks like a procedure code."""
+    if CODE_VALIDATION == "off":
+        return []
+    issues = []
+    for diagnosis in diagnosis_code.replace(";", ",").split(","):
+        if diagnosis.strip():
+            issue = _check("diagnosis_code", diagnosis.strip(), ICD10_PATTERN, "icd10cm", "ICD-10-CM")
+            if issue:
+                issues.append(issue)
+    token = normalize_code(service)
+    if PROCEDURE_PATTERN.match(token):
+        issue = _check("service", service.strip(), PROCEDURE_PATTERN, "procedures", "CPT/HCPCS")
+        if issue:
+            issues.append(issue)
+    return issues
+
+
+@router.get("/codes/suggest")
+def suggest_codes(
+    q: str = Query(..., min_length=1),
+    table: str = Query("icd10cm", alias="set", regex="^(icd10cm|procedures)$"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Codes in the ICD-10-CM or procedure table starting with `q` (dots ignored)."""
+    codes = codeset(table)
+    if codes is None:
+        raise HTTPException(503, f"Code set '{table}' is not installed.")
+    return codes.prefix(q, limit)
@@ -0,0 +1,132 @@
+import os
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# ========== RESPONSE COMPRESSION ==========
+# Pure ASGI middleware: negotiates br (if the brotli package is installed) or gzip
+# from Accept-Encoding, and compresses bodies at or above a size threshold.
+# Single-message bodies are compressed in one shot; streamed bodies go through an
+# incremental compressor so memory stays bounded.
+
+MINIMUM_SIZE = int(os.getenv("EPOCHPA_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("EPOCHPA_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("EPOCHPA_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values (q=0 refuses)."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        fields = part.strip().split(";")
+        coding = fields[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        offered[coding] = q
+    wildcard = offered.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = offered.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self._finish = self._c.process, self._c.finish
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self._finish = self._c.compress, self._c.flush
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for key, value in scope.get("headers", ()):
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            start = state["start"]
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if state["passthrough"]:
+                await send(message)
+                return
+
+            if state["compressor"] is None:
+                headers = {k.lower(): v for k, v in start["headers"]}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                compressible = (
+                    start["status"] not in (204, 304)
+                    and b"content-encoding" not in headers
+                    and content_type.startswith(COMPRESSIBLE_TYPES)
+                    and (more or len(body) >= self.minimum_size)
+                )
+                if not compressible:
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+                state["compressor"] = _Compressor(encoding)
+                raw_headers = [(k, v) for k, v in start["headers"] if k.lower() not in (b"content-length", b"vary")]
+                vary = headers.get(b"vary")
+                raw_headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                raw_headers.append((b"content-encoding", encoding.encode()))
+                if not more:
+                    compressed = state["compressor"].compress(body) + state["compressor"].finish()
+                    raw_headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send(dict(start, headers=raw_headers))
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send(dict(start, headers=raw_headers))
+
+            chunk = state["compressor"].compress(body)
+            if not more:
+                chunk += state["compressor"].finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
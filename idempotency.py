@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from fastapi import HTTPException, Response
+
+from codesets import normalize_code
+from metrics import registry
+
+# ========== IDEMPOTENCY / DUPLICATE DETECTION ==========
+# Two layers against the same PA being worked twice:
+#  * Idempotency-Key: a retried request with the same key gets the original
+#    response bytes back (header Idempotent-Replayed: true) instead of a new PA.
+#  * Fingerprints: (provider_npi, member_id, patient_dob, service, diagnosis_code)
+#    seen within EPOCHPA_DUPLICATE_WINDOW_HOURS are flagged on the new PA
+#    (possible_duplicate_of) or, in merge mode, folded into the open original.
+# Both are dicts kept in insertion order, so lookups are O(1) and expiry pops
+# from the front.
+
+IDEMPOTENCY_TTL = int(os.getenv("EPOCHPA_IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("EPOCHPA_IDEMPOTENCY_MAX_KEYS", "100000"))
+DUPLICATE_WINDOW = float(os.getenv("EPOCHPA_DUPLICATE_WINDOW_HOURS", "24")) * 3600
+DUPLICATE_MODE = os.getenv("EPOCHPA_DUPLICATE_MODE", "flag").lower()   # flag | merge | off
+
+idempotent_replays = registry.counter(
+    "epochpa_idempotent_replays_total", "Submissions answered from the idempotency key store.")
+duplicates_detected = registry.counter(
+    "epochpa_duplicate_submissions_total", "Submissions matching a recent PA fingerprint.", ("action",))
+
+_PENDING = object()
+
+
+class IdempotencyStore:
+    """Bounded, TTL-expiring map of idempotency key -> (request hash, status, body)."""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._entries:
+            _, (expires, _, _) = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) < self.max_keys:
+                break
+            self._entries.popitem(last=False)
+
+    def claim(self, key: Hashable, request_hash: str) -> Optional[Response]:
+        """The stored response for a replayed key, or None after reserving the key for this request."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = (now + self.ttl, request_hash, _PENDING)
+                return None
+        _, stored_hash, result = entry
+        if stored_hash != request_hash:
+            raise HTTPException(422, "Idempotency-Key was already used with a different request body.")
+        if result is _PENDING:
+            raise HTTPException(409, "A request with this Idempotency-Key is still in progress.",
+                                headers={"Retry-After": "1"})
+        idempotent_replays.inc()
+        status_code, body = result
+        return Response(content=body, status_code=status_code, media_type="application/json",
+                        headers={"Idempotent-Replayed": "true"})
+
+    def complete(self, key: Hashable, response: Response):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], entry[1], (response.status_code, bytes(response.body)))
+
+    def release(self, key: Hashable):
+        """Forget a key whose request failed, so the client can retry with it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is _PENDING:
+                del self._entries[key]
+
+
+def fingerprint(provider_npi: str, member_id: str, patient_dob: str, service: str, diagnosis_code: str) -> tuple:
+    def norm(value: str) -> str:
+        return " ".join((value or "").split()).upper()
+    return (norm(provider_npi), norm(member_id), norm(patient_dob), norm(service), normalize_code(diagnosis_code))
+
+
+class DuplicateIndex:
+    """Fingerprint -> (submission id, first seen) for PAs submitted within the window."""
+
+    def __init__(self, window: float = DUPLICATE_WINDOW):
+        self.window = window
+        self._entries: "OrderedDict[tuple, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_and_add(self, fp: tuple, submission_id: str) -> Optional[str]:
+        """The id of a PA with this fingerprint inside the window, else None after recording this one."""
+        now = time.time()
+        with self._lock:
+            while self._entries:
+                _, (_, seen) = next(iter(self._entries.items()))
+                if now - seen <= self.window:
+                    break
+                self._entries.popitem(last=False)
+            entry = self._entries.get(fp)
+            if entry is not None:
+                return entry[0]
+            self._entries[fp] = (submission_id, now)
+            return None
+
+    def replace(self, fp: tuple, submission_id: str):
+        """Point the fingerprint at a newer PA (e.g. the original was already finalized)."""
+        with self._lock:
+            self._entries.pop(fp, None)
+            self._entries[fp] = (submission_id, time.time())
+
+    def discard(self, fp: tuple, submission_id: str):
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is not None and entry[0] == submission_id:
+                del self._entries[fp]
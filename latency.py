@@ -0,0 +1,181 @@
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# ========== STREAMING QUANTILE SKETCHES ==========
+# Status-transition durations (seconds) are folded into log-bucketed sketches
+# (DDSketch-style): every quantile is within RELATIVE_ACCURACY of the true value,
+# two sketches merge by adding bucket counts, and the bucket count is capped so
+# memory per key stays constant no matter how many PAs flow through.
+
+RELATIVE_ACCURACY = 0.01
+MAX_BUCKETS = 1024
+SLOT_SECONDS = 3600        # one sketch per hour...
+NUM_SLOTS = 24 * 7         # ...kept for a week of windowed views
+MAX_WINDOW = SLOT_SECONDS * NUM_SLOTS   # longer windows would silently cover only the last week
+
+DIMENSIONS = ("global", "insurance", "service", "rep")
+
+# Fixed histogram edges (seconds) reported alongside the quantiles
+HISTOGRAM_EDGES = [60, 300, 900, 3600, 4 * 3600, 8 * 3600, 86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400]
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded memory and relative-error guarantees."""
+
+    __slots__ = ("gamma", "log_gamma", "max_buckets", "buckets", "zero_count", "count", "total", "min", "max")
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY, max_buckets: int = MAX_BUCKETS):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: int = 1):
+        if value < 0:
+            value = 0.0
+        self.count += weight
+        self.total += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 1e-9:
+            self.zero_count += weight
+            return
+        idx = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[idx] = self.buckets.get(idx, 0) + weight
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        # Fold the lowest buckets together; the high tail is what we care about
+        keys = sorted(self.buckets)
+        while len(keys) > self.max_buckets:
+            lowest = keys.pop(0)
+            self.buckets[keys[0]] += self.buckets.pop(lowest)
+
+    def merge(self, other: "QuantileSketch"):
+        if other.count == 0:
+            return
+        for idx, n in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + n
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _bucket_value(self, idx: int) -> float:
+        return 2 * self.gamma ** idx / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen > rank:
+                return min(max(self._bucket_value(idx), self.min), self.max)
+        return self.max
+
+    def histogram(self, edges: List[float] = HISTOGRAM_EDGES) -> List[dict]:
+        counts = [0] * (len(edges) + 1)
+        counts[0] += self.zero_count
+        for idx, n in self.buckets.items():
+            value = self._bucket_value(idx)
+            pos = 0
+            while pos < len(edges) and value > edges[pos]:
+                pos += 1
+            counts[pos] += n
+        bins = []
+        for i, n in enumerate(counts):
+            bins.append({"le": edges[i] if i < len(edges) else "+Inf", "count": n})
+        return bins
+
+
+class WindowedSketch:
+    """Ring of per-slot sketches plus a lifetime sketch, for time-windowed views."""
+
+    __slots__ = ("slot_seconds", "slots", "lifetime")
+
+    def __init__(self, slot_seconds: int = SLOT_SECONDS, num_slots: int = NUM_SLOTS):
+        self.slot_seconds = slot_seconds
+        self.slots: List[Optional[Tuple[int, QuantileSketch]]] = [None] * num_slots
+        self.lifetime = QuantileSketch()
+
+    def add(self, value: float, now: float):
+        epoch = int(now // self.slot_seconds)
+        pos = epoch % len(self.slots)
+        slot = self.slots[pos]
+        if slot is None or slot[0] != epoch:
+            slot = (epoch, QuantileSketch())
+            self.slots[pos] = slot
+        slot[1].add(value)
+        self.lifetime.add(value)
+
+    def view(self, window: Optional[int], now: float) -> QuantileSketch:
+        if not window:
+            return self.lifetime
+        oldest = int((now - window) // self.slot_seconds)
+        merged = QuantileSketch()
+        for slot in self.slots:
+            if slot is not None and slot[0] >= oldest:
+                merged.merge(slot[1])
+        return merged
+
+
+def summarize(sketch: QuantileSketch) -> dict:
+    return {
+        "count": sketch.count,
+        "mean": sketch.total / sketch.count if sketch.count else None,
+        "min": sketch.min if sketch.count else None,
+        "max": sketch.max if sketch.count else None,
+        "p50": sketch.quantile(0.50),
+        "p90": sketch.quantile(0.90),
+        "p99": sketch.quantile(0.99),
+        "histogram": sketch.histogram(),
+    }
+
+
+class TransitionLatency:
+    """Per-payer, per-service, per-rep and global sketches of status-transition durations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sketches: Dict[Tuple[str, str], WindowedSketch] = {}
+
+    def record(self, seconds: float, insurance: Optional[str], service: Optional[str],
+               rep: Optional[str], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        keys = [("global", "all"), ("insurance", insurance or "unknown"),
+                ("service", service or "unknown"), ("rep", rep or "Unassigned")]
+        with self._lock:
+            for key in keys:
+                sketch = self._sketches.get(key)
+                if sketch is None:
+                    sketch = self._sketches[key] = WindowedSketch()
+                sketch.add(seconds, now)
+
+    def keys(self, dimension: str) -> List[str]:
+        with self._lock:
+            return sorted(k for d, k in self._sketches if d == dimension)
+
+    def snapshot(self, dimension: str, key: str, window: Optional[int] = None) -> Optional[dict]:
+        with self._lock:
+            sketch = self._sketches.get((dimension, key))
+            if sketch is None:
+                return None
+            return summarize(sketch.view(window, time.time()))
+
+
+transition_latency = TransitionLatency()
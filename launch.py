@@ -1,33 +1,138 @@
+import argparse
+import os
 import subprocess
+import sys
+import threading
 import time
+import urllib.request
 import webbrowser
 
-FASTAPI_URL = "http://127.0.0.1:8000/docs"      # Swagger UI for FastAPI
-STREAMLIT_URL = "http://localhost:8501"         # Streamlit default
+API_HOST = "127.0.0.1"
+API_PORT = 8000
+UI_PORT = 8501
 
-if __name__ == "__main__":
-    # Start FastAPI backend
-    fastapi_proc = subprocess.Popen([
-        "uvicorn", "main:app", "--host", "127.0.0.1", "--port", "8000", "--reload"
-    ])
-    time.sleep(2)  # Give FastAPI a moment to start
+MAX_BACKOFF = 30.0        # seconds between restarts of a crash-looping child
+STABLE_AFTER = 60.0       # a child that ran this long resets its backoff
+
+
+def is_ready(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return resp.status == 200
+    except Exception:
+        return False
+
+
+class Child:
+    """A supervised subprocess: started, readiness-polled, and restarted if it crashes."""
+
+    def __init__(self, name: str, cmd: list, ready_url: str, open_url: str = None):
+        self.name = name
+        self.cmd = cmd
+        self.ready_url = ready_url
+        self.open_url = open_url
+        self.proc = None
+        self.started_at = 0.0
+        self.backoff = 1.0
+        self.restarts = 0
+        self.restart_at = None    # set while backing off before a restart
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.proc = subprocess.Popen(self.cmd)
 
-    # Open FastAPI docs in browser
-    webbrowser.open(FASTAPI_URL)
+    def wait_ready(self, timeout: float, open_browser: bool):
+        while time.perf_counter() - self.started_at < timeout:
+            if self.proc.poll() is not None:
+                return
+            if is_ready(self.ready_url):
+                print(f"[launch] {self.name} ready in {time.perf_counter() - self.started_at:.2f}s")
+                if open_browser and self.open_url:
+                    webbrowser.open(self.open_url)
+                return
+            time.sleep(0.1)
+        print(f"[launch] {self.name} not ready after {timeout:.0f}s")
+
+    def check(self) -> bool:
+        """
+        Restart the child if it exited, once its backoff has elapsed. Returns True if a restart happened.
+        Never sleeps, so the supervise loop keeps watching the other children meanwhile.
+        """
+        if self.restart_at is None:
+            code = self.proc.poll()
+            if code is None:
+                return False
+            ran_for = time.perf_counter() - self.started_at
+            if ran_for > STABLE_AFTER:
+                self.backoff = 1.0
+            print(f"[launch] {self.name} exited with code {code}; restarting in {self.backoff:.0f}s")
+            self.restart_at = time.perf_counter() + self.backoff
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+        if time.perf_counter() < self.restart_at:
+            return False
+        self.restart_at = None
+        self.restarts += 1
+        self.start()
+        return True
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def build_children(args) -> list:
+    api_cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", args.host, "--port", str(args.api_port)]
+    if args.prod:
+        api_cmd += ["--workers", str(args.workers), "--no-access-log"]
+    else:
+        api_cmd += ["--reload"]
+    ui_cmd = [sys.executable, "-m", "streamlit", "run", "streamlit_app.py",
+              "--server.port", str(args.ui_port), "--server.headless", "true"]
+    api_base = f"http://{args.host}:{args.api_port}"
+    ui_base = f"http://localhost:{args.ui_port}"
+    return [
+        Child("FastAPI", api_cmd, f"{api_base}/readyz", f"{api_base}/docs"),
+        Child("Streamlit", ui_cmd, f"{ui_base}/_stcore/health", ui_base),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start the EpochPA API and Streamlit app")
+    parser.add_argument("--prod", action="store_true", help="no auto-reload; run --workers API processes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("EPOCHPA_WORKERS", "1")),
+                        help="API worker processes in --prod (each keeps its own in-memory PA store)")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--api-port", type=int, default=API_PORT)
+    parser.add_argument("--ui-port", type=int, default=UI_PORT)
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    parser.add_argument("--no-browser", action="store_true")
+    args = parser.parse_args()
 
-    # Start Streamlit frontend
-    streamlit_proc = subprocess.Popen([
-        "streamlit", "run", "streamlit_app.py"
-    ])
-    time.sleep(3)  # Wait for Streamlit server to start
+    if args.prod and args.workers > 1:
+        print(f"[launch] {args.workers} API workers: PA submissions are held in memory per worker")
 
-    # Open Streamlit app in browser
-    webbrowser.open(STREAMLIT_URL)
+    children = build_children(args)
+    # Start both processes at once and poll readiness instead of sleeping
+    for child in children:
+        child.start()
+    waiters = [
+        threading.Thread(target=c.wait_ready, args=(args.ready_timeout, not args.no_browser), daemon=True)
+        for c in children
+    ]
+    for w in waiters:
+        w.start()
 
     try:
-        fastapi_proc.wait()
-        streamlit_proc.wait()
+        while True:
+            for child in children:
+                if child.check():
+                    threading.Thread(target=child.wait_ready, args=(args.ready_timeout, False), daemon=True).start()
+            time.sleep(0.5)
     except KeyboardInterrupt:
         print("Shutting down both processes...")
-        fastapi_proc.terminate()
-        streamlit_proc.terminate()
+        for child in children:
+            child.stop()
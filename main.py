@@ -1,11 +1,62 @@
+from dotenv import load_dotenv
+load_dotenv()  # before importing modules that read configuration from the environment
+
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from auth import router as auth_router
-from pa import router as pa_router
+from auth import confirmed_users, init_db, db_ready, router as auth_router
+from codesets import CODESETS, codeset, router as codesets_router
+from archive import ARCHIVE_INTERVAL, archive
+from assignment import scheduler
+from pa import archive_sweep, router as pa_router
+from payers import router as payers_router
+from uploads import router as uploads_router
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, registry
+from profiling import ProfilingMiddleware
+
+_ready = False
+
+async def _archive_loop():
+    """Periodically move old finalized PAs out of the hot store (see archive.py)."""
+    from starlette.concurrency import run_in_threadpool
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+        try:
+            await run_in_threadpool(archive_sweep)
+            await run_in_threadpool(archive().compact)
+        except Exception as e:
+            print("ARCHIVE SWEEP FAILED:", repr(e), file=sys.stderr)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work lives here, not in module imports, so workers boot fast and
+    # /readyz only flips once everything the routes need is in place.
+    global _ready
+    init_db()
+    for rep in confirmed_users("rep"):
+        if not scheduler.has_rep(rep):
+            scheduler.add_rep(rep)  # rep pool starts as every confirmed rep account
+    for name in CODESETS:
+        codeset(name)  # compiles/maps the code tables before traffic arrives
+    archive()  # loads segment indexes
+    sweeper = asyncio.create_task(_archive_loop()) if ARCHIVE_INTERVAL > 0 else None
+    _ready = True
+    yield
+    _ready = False
+    if sweeper is not None:
+        sweeper.cancel()
 
-app = FastAPI(title="EpochPA API")
+app = FastAPI(title="EpochPA API", lifespan=lifespan)
+
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)  # opt-in; see profiling.py
 
 app.add_middleware(
     CORSMiddleware,
@@ -54,6 +105,25 @@ async def homepage():
     </html>
     """
 
+# --- Health checks (liveness / readiness) ---
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+def readyz():
+    if _ready and db_ready():
+        return {"status": "ready"}
+    return JSONResponse({"status": "starting"}, status_code=503)
+
+# --- Prometheus scrape endpoint ---
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Mount all API endpoints under /intake
 app.include_router(auth_router, prefix="/intake")
 app.include_router(pa_router, prefix="/intake")
+app.include_router(uploads_router, prefix="/intake")
+app.include_router(payers_router, prefix="/intake")
+app.include_router(codesets_router, prefix="/intake")
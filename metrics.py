@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# ========== PROMETHEUS METRICS ==========
+# A small in-process registry rendered in the Prometheus text exposition format
+# at /metrics. Kept dependency-free and cheap: one dict lookup and a lock per
+# observation; gauges are callbacks evaluated only at scrape time.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, values)} {_fmt(v)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts..., +Inf count, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        pos = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 3)
+            series[pos] += 1  # non-cumulative here; summed up at render time
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for edge, n in zip(self.buckets + (float("inf"),), series):
+                    cumulative += n
+                    le = 'le="%s"' % _fmt(edge)
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_fmt(series[-2])}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose samples come from a callback at scrape time: returns a number or {labelvalues: number}."""
+
+    def __init__(self, name: str, help: str, fn: Callable, labelnames: Iterable[str] = ()):
+        self.name, self.help, self.fn, self.labelnames = name, help, fn, tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            for values, v in sorted(value.items()):
+                values = values if isinstance(values, tuple) else (values,)
+                lines.append(f"{self.name}{_labels(self.labelnames, values)} {_fmt(v)}")
+        elif value is not None:
+            lines.append(f"{self.name} {_fmt(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._metrics.get(name) or self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.get(name) or self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, fn, labelnames))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ----- HTTP server side -----
+http_requests = registry.counter(
+    "epochpa_http_requests_total", "HTTP requests by route, method and status code.", ("method", "route", "status"))
+http_latency = registry.histogram(
+    "epochpa_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+http_exceptions = registry.counter(
+    "epochpa_http_exceptions_total", "Requests that raised an unhandled exception.", ("method", "route"))
+
+# ----- Outbound calls (Availity, Brevo) -----
+outbound_requests = registry.counter(
+    "epochpa_outbound_requests_total", "Outbound API calls by target and outcome.", ("target", "outcome"))
+outbound_latency = registry.histogram(
+    "epochpa_outbound_request_duration_seconds", "Outbound API call latency by target.", ("target",))
+
+# ----- Caches -----
+cache_requests = registry.counter(
+    "epochpa_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+
+
+@contextmanager
+def time_outbound(target: str):
+    """Time an outbound call. Set `call["outcome"]` inside the block to override success/error."""
+    call = {"outcome": "success"}
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call["outcome"] = "exception"
+        raise
+    finally:
+        outbound_latency.observe(time.perf_counter() - start, target)
+        outbound_requests.inc(target, call["outcome"])
+
+
+def route_label(scope: dict) -> str:
+    # Route templates keep label cardinality bounded (no IDs or query strings)
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return scope.get("root_path", "") + route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route request counts, latency and errors."""
+
+    def __init__(self, app, skip_paths: Iterable[str] = ("/metrics", "/healthz", "/readyz")):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            http_exceptions.inc(method, route_label(scope))
+            raise
+        finally:
+            route = route_label(scope)
+            http_latency.observe(time.perf_counter() - start, method, route)
+            http_requests.inc(method, route, str(status["code"]))
@@ -1,14 +1,73 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Body
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Body, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from collections import deque
+from contextlib import contextmanager
+import hashlib
+import itertools
+import threading
+import os
 import uuid
-import requests
+import zlib
 
-router = APIRouter()
+from archive import ARCHIVE_AFTER_DAYS, archive, loads
+from assignment import scheduler
+from codesets import CODE_VALIDATION, validate_codes
+from idempotency import DUPLICATE_MODE, DuplicateIndex, IdempotencyStore, duplicates_detected, fingerprint
+from circuit import LastKnownGood, availity_coverage_breaker, stale_served
+from latency import DIMENSIONS, MAX_WINDOW, transition_latency
+from metrics import cache_requests, registry, time_outbound
+from payers import resolve_payer
+from profiling import ProfiledRoute, span
+from records import KNOWN_STATUSES, Submission, now_us, to_us
+from ratelimit import acquire_availity, admission_control, limit_provider
+from serialization import FastJSONResponse, dumps
 
-# In-memory submissions store
-_submissions: List[dict] = []
+router = APIRouter(route_class=ProfiledRoute, default_response_class=FastJSONResponse, dependencies=[Depends(admission_control)])
+
+# In-memory submissions store (compact records; see records.py)
+_submissions: List[Submission] = []
+_index: Dict[str, Submission] = {}  # submission id -> submission
+_store_lock = threading.Lock()      # guards rebuilding _submissions against concurrent appends
+# Finalized PAs on their way to the archive tier (out of the hot store, segment not yet written)
+_archiving: Dict[str, Submission] = {}
+
+# Store-wide revision: bumped on every mutation, so an unfiltered /list ETag is O(1).
+# The boot nonce keeps a restarted (or different) worker's "r1" from matching a stale one.
+_boot_nonce = uuid.uuid4().hex[:12]
+_revision = 0
+_revisions = itertools.count(1)
+_last_modified = datetime.now(timezone.utc)
+# Per-view revisions for filtered /list ETags: ("provider" | "rep" | "status", value) ->
+# (revision, time) of the last change to any PA in that view, before or after the change
+_view_revisions: Dict[tuple, tuple] = {}
+
+# Compare-and-set guards: a submission's version check and its mutation happen
+# under one of these striped locks, held only for the in-memory update itself.
+_cas_locks = [threading.Lock() for _ in range(64)]
+# Serializes scheduler-driven reassignment sweeps (queue drain / rebalance)
+_assign_lock = threading.Lock()
+
+FINAL_STATUSES = ("Approved", "Denied")
+
+# PAs waiting for a rep with free capacity (oldest first)
+_unassigned: deque = deque()
+
+# Idempotency-Key responses and recent-submission fingerprints (see idempotency.py)
+_idempotency = IdempotencyStore()
+_duplicates = DuplicateIndex()
+# Ids of submissions between their fingerprint check and _store (eligibility call in between),
+# so a concurrent duplicate can tell "original still in flight" from "original failed"
+_in_flight: Dict[str, bool] = {}
+
+# Scrape-time gauges for /metrics
+registry.gauge("epochpa_store_submissions", "PA submissions held in the in-memory store.", lambda: len(_submissions))
+registry.gauge("epochpa_unassigned_queue_depth", "PAs waiting for a rep with free capacity.", lambda: len(_unassigned))
+registry.gauge("epochpa_rep_open_workload", "Open PAs per rep in the assignment pool.",
+               lambda: {r["rep"]: r["open"] for r in scheduler.reps()}, ("rep",))
 
 class PARequest(BaseModel):
     provider_npi: str
@@ -20,81 +79,435 @@ class PARequest(BaseModel):
     diagnosis_code: str
     notes: Optional[str] = None
 
+# ------ Versioning / conditional GET helpers ------
+def _find(submission_id: str) -> Optional[Submission]:
+    return _index.get(submission_id)
+
+def _find_writable(submission_id: str) -> Submission:
+    """The live submission to mutate: 409 if it has moved to the (read-only) archive, 404 if unknown."""
+    s = _index.get(submission_id)
+    if s is not None:
+        return s
+    if submission_id in _archiving or archive().get(submission_id) is not None:
+        raise HTTPException(409, "Submission was archived and is read-only.")
+    raise HTTPException(404, "Submission not found.")
+
+def _bump_revision() -> tuple:
+    global _revision, _last_modified
+    revision, now = next(_revisions), datetime.now(timezone.utc)
+    _revision, _last_modified = revision, now
+    return revision, now
+
+def _view_keys(s: Submission) -> tuple:
+    return ("provider", s.provider_npi), ("rep", s.assigned_rep), ("status", s.status)
+
+def _stamp_views(keys, stamp: tuple):
+    for key in keys:
+        _view_revisions[key] = stamp
+
+def _touch(s: Submission, before: tuple = ()):
+    """Record a mutation: bump the submission's version, the store revision and its views' revisions."""
+    stamp = _bump_revision()
+    s.version += 1
+    s.updated_at = to_us(stamp[1].isoformat())
+    _stamp_views(before + _view_keys(s), stamp)
+
+def _expected_version(s: Submission, if_match: Optional[str], expected_version: Optional[int]) -> Optional[int]:
+    """
+    The version a conditional write expects. If-Match must name this submission's own
+    ETag (W/"<id>-<version>", weak or strong form, comma lists allowed); "*" matches any
+    current representation, so there is no version check. Without it, expected_version is used.
+    """
+    if not if_match:
+        return expected_version
+    if if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if len(tag) < 2 or not (tag.startswith('"') and tag.endswith('"')):
+            raise HTTPException(400, "Malformed If-Match.")
+        tag_id, _, version = tag[1:-1].rpartition("-")
+        if tag_id == s.id and version.isdigit():
+            versions.append(int(version))
+    if not versions:
+        raise HTTPException(409, "If-Match does not name this submission. Reload and retry.",
+                            headers={"ETag": f'W/"{s.id}-{s.version}"'})
+    # _mutate re-checks under the CAS lock
+    return s.version if s.version in versions else versions[0]
+
+@contextmanager
+def _mutate(s: Submission, expected_version: Optional[int] = None):
+    """
+    Atomic compare-and-set on one submission: fails with 409 if its version is not
+    `expected_version` (when given), otherwise applies the block and bumps the version.
+    """
+    with _cas_locks[zlib.crc32(s.id.encode()) % len(_cas_locks)]:
+        if _index.get(s.id) is not s:
+            raise HTTPException(409, "Submission was archived and is read-only.")
+        if expected_version is not None and expected_version != s.version:
+            raise HTTPException(
+                409,
+                f"Version conflict: expected {expected_version}, current is {s.version}. Reload and retry.",
+                headers={"ETag": f'W/"{s.id}-{s.version}"'}
+            )
+        before = _view_keys(s)
+        yield s
+        _touch(s, before)
+
+def _http_date(us: int) -> str:
+    return format_datetime(datetime.fromtimestamp(us // 1_000_000, timezone.utc), usegmt=True)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+def _not_modified(etag: str, last_modified: str) -> Response:
+    cache_requests.inc("etag", "hit")
+    return Response(status_code=304, headers={"ETag": etag, "Last-Modified": last_modified})
+
 # ------ Availity Eligibility Integration ------
+AVAILITY_COVERAGES_URL = os.getenv("AVAILITY_COVERAGES_URL", "https://api.availity.com/availity/v1/coverages")
+# Last good coverage answer per (providerNpi, memberId, payerId, birthDate), served stale during outages
+_eligibility_cache = LastKnownGood()
+
+def _eligibility_key(coverage_payload: dict) -> tuple:
+    return tuple(coverage_payload.get(k) for k in ("providerNpi", "memberId", "payerId", "birthDate"))
+
+def _stale_eligibility(key: tuple, error: str) -> dict:
+    """Last known-good eligibility for this member, marked stale; else the error."""
+    cached = _eligibility_cache.get(key)
+    if cached is None:
+        return {"error": error, "status_code": 503}
+    stale_served.inc(availity_coverage_breaker.name)
+    fetched_at, result = cached
+    return {
+        "stale": True,
+        "fetched_at": datetime.fromtimestamp(fetched_at, timezone.utc).isoformat().replace("+00:00", "Z"),
+        "error": error,
+        "result": result,
+    }
+
 def get_eligibility_from_availity(access_token: str, coverage_payload: dict):
-    url = "https://api.availity.com/availity/v1/coverages"
+    import requests  # deferred: keeps app import (cold start) light
+    url = AVAILITY_COVERAGES_URL
     headers = {"Authorization": f"Bearer {access_token}"}
+    key = _eligibility_key(coverage_payload)
+    # Breaker open: answer from the last known-good result without touching Availity
+    if not availity_coverage_breaker.allow():
+        return _stale_eligibility(key, "Availity unavailable (circuit open); eligibility not re-checked.")
+    # Shared Availity quota: wait our turn rather than fail, up to a bounded queue time
+    if not acquire_availity():
+        availity_coverage_breaker.cancel()
+        return {"error": "Availity quota busy; eligibility check skipped.", "status_code": 429}
     try:
-        resp = requests.get(url, headers=headers, params=coverage_payload, timeout=10)
-        if resp.status_code == 200:
-            return resp.json()
-        else:
-            return {"error": resp.text, "status_code": resp.status_code}
+        with span("availity.coverages"), time_outbound("availity_coverages") as call:
+            resp = requests.get(url, headers=headers, params=coverage_payload,
+                                timeout=availity_coverage_breaker.timeout)
+            if resp.status_code != 200:
+                call["outcome"] = "error"
     except Exception as e:
-        return {"error": str(e)}
+        availity_coverage_breaker.record(False)
+        return _stale_eligibility(key, str(e))
+    # 5xx/429 mean Availity is struggling; other 4xx are about this request only
+    availity_coverage_breaker.record(resp.status_code < 500 and resp.status_code != 429)
+    if resp.status_code == 200:
+        result = resp.json()
+        _eligibility_cache.put(key, result)
+        return result
+    if resp.status_code >= 500 or resp.status_code == 429:
+        return _stale_eligibility(key, resp.text)
+    return {"error": resp.text, "status_code": resp.status_code}
 
 @router.post("/submit", status_code=201)
 def submit(
     request: PARequest,
-    authorization: Optional[str] = Header(None)
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """Provider submits new PA request. Each request gets a unique ID and status history.
-    Optionally calls Availity for eligibility if an Authorization header (Bearer token) is present."""
+    Optionally calls Availity for eligibility if an Authorization header (Bearer token) is present.
+    A retry carrying the same Idempotency-Key gets the original response instead of a second PA."""
+    limit_provider("submit", request.provider_npi, "/intake/submit")
+    if not idempotency_key:
+        return _submit(request, authorization)
+    key = (request.provider_npi, idempotency_key)
+    replay = _idempotency.claim(key, hashlib.sha256(dumps(request.dict())).hexdigest())
+    if replay is not None:
+        return replay
+    try:
+        response = _submit(request, authorization)
+    except BaseException:
+        _idempotency.release(key)
+        raise
+    _idempotency.complete(key, response)
+    return response
+
+def _submit(request: PARequest, authorization: Optional[str]) -> FastJSONResponse:
+    code_issues = validate_codes(request.diagnosis_code, request.service)
+    if code_issues and CODE_VALIDATION == "strict":
+        raise HTTPException(422, {"message": "Invalid diagnosis or service code.", "issues": code_issues})
     data = request.dict()
     data["id"] = str(uuid.uuid4())
-    data["status"] = "Submitted"
-    data["status_history"] = [{
-        "status": "Submitted",
-        "timestamp": datetime.utcnow().isoformat() + "Z"
-    }]
-    data["documents"] = []
-    data["assigned_rep"] = None  # Add this field for assignment
-
-    # --- New: Check for Availity Token ---
-    eligibility_response = None
-    if authorization and authorization.lower().startswith("bearer "):
-        access_token = authorization.split()[1]
-        # You can build out this payload with the correct fields for Availity
-        coverage_payload = {
-            "providerNpi": data["provider_npi"],
-            "memberId": data["member_id"],
-            "payerId": data["insurance"],   # You might want to map this
-            "birthDate": data["patient_dob"]
-        }
-        eligibility_response = get_eligibility_from_availity(access_token, coverage_payload)
-        data["eligibility_response"] = eligibility_response
-    else:
-        data["eligibility_response"] = "No Availity token provided. Skipped eligibility check."
-    
-    _submissions.append(data)
-    return {"message": "PA request submitted successfully.", "data": data}
+
+    # Same provider/member/DOB/service/diagnosis within the window: flag it, or merge into the open original
+    fp = None
+    data["possible_duplicate_of"] = None
+    if DUPLICATE_MODE != "off":
+        fp = fingerprint(data["provider_npi"], data["member_id"], data["patient_dob"], data["service"], data["diagnosis_code"])
+        _in_flight[data["id"]] = True  # before the fingerprint can point at it
+        original_id = _duplicates.check_and_add(fp, data["id"])
+        original = _find(original_id) if original_id else None
+        if original is not None:
+            if DUPLICATE_MODE == "merge" and _is_open(original):
+                _in_flight.pop(data["id"], None)
+                duplicates_detected.inc("merged")
+                return _merge_duplicate(original, data)
+            duplicates_detected.inc("flagged")
+            data["possible_duplicate_of"] = original_id
+            if not _is_open(original):
+                _duplicates.replace(fp, data["id"])
+        elif original_id in _in_flight:
+            # Original not stored yet: flag against it and leave the fingerprint pointing there
+            duplicates_detected.inc("flagged")
+            data["possible_duplicate_of"] = original_id
+        elif original_id:
+            _duplicates.replace(fp, data["id"])  # original failed or is gone
+
+    record = None
+    try:
+        record = Submission(data["id"], data["provider_npi"], data["patient_name"], data["patient_dob"],
+                            data["insurance"], data["member_id"], data["service"], data["diagnosis_code"],
+                            data["notes"])
+        record.possible_duplicate_of = data["possible_duplicate_of"]
+        record.set_status("Submitted")
+        record.code_warnings = code_issues or None
+        # Free-text insurance -> canonical payer ID (None if not in the payer directory)
+        record.set_payer(resolve_payer(record.insurance))
+        record.set_rep(scheduler.pick(_payer_key(record), record.service))
+
+        # --- New: Check for Availity Token ---
+        eligibility_response = None
+        if authorization and authorization.lower().startswith("bearer "):
+            access_token = authorization.split()[1]
+            # You can build out this payload with the correct fields for Availity
+            coverage_payload = {
+                "providerNpi": record.provider_npi,
+                "memberId": record.member_id,
+                "payerId": record.payer_id or record.insurance,
+                "birthDate": record.patient_dob
+            }
+            eligibility_response = get_eligibility_from_availity(access_token, coverage_payload)
+            record.eligibility_response = eligibility_response
+        else:
+            record.eligibility_response = "No Availity token provided. Skipped eligibility check."
+
+        with span("submit.store"):
+            _store(record)
+    except BaseException:
+        if fp is not None:
+            _duplicates.discard(fp, data["id"])
+        if record is not None and _index.get(record.id) is not record:
+            scheduler.release(record.assigned_rep)  # picked but never stored
+        raise
+    finally:
+        _in_flight.pop(data["id"], None)
+    return FastJSONResponse({"message": "PA request submitted successfully.", "data": record.to_dict()}, status_code=201)
+
+def _merge_duplicate(original: Submission, data: dict) -> FastJSONResponse:
+    """Fold a duplicate submission into the open original: its notes are appended, no new PA is created."""
+    if data.get("notes") and data["notes"] not in (original.notes or ""):
+        with _mutate(original):
+            original.notes = f"{original.notes}\n\n{data['notes']}" if original.notes else data["notes"]
+    return FastJSONResponse({
+        "message": "Duplicate of an open PA request; merged into it.",
+        "data": original.to_dict(),
+        "duplicate_of": original.id,
+    }, status_code=200)
+
+def _store(s: Submission) -> Submission:
+    """Add a new submission to the in-memory store (queued if no rep had room)."""
+    _touch(s)
+    with _store_lock:
+        _submissions.append(s)
+    _index[s.id] = s
+    # Bump again now it is visible, so a /list that read the first bump can't pair it with a scan that missed it
+    _stamp_views(_view_keys(s), _bump_revision())
+    if s.assigned_rep is None:
+        _unassigned.append(s)
+    return s
+
+# ------ Rep assignment helpers ------
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+def _payer_key(s: Submission) -> str:
+    """Payer affinity key: the canonical payer ID, else the raw insurance text."""
+    return s.payer_id or s.insurance
+
+def _is_open(s: Submission) -> bool:
+    return s.status not in FINAL_STATUSES
+
+def _drain_unassigned():
+    """Hand queued PAs to reps that have room again."""
+    with _assign_lock:
+        while _unassigned:
+            s = _unassigned[0]
+            if s.assigned_rep is not None or not _is_open(s):
+                _unassigned.popleft()
+                continue
+            rep = scheduler.pick(_payer_key(s), s.service)
+            if rep is None:
+                break
+            with _mutate(s):
+                if s.assigned_rep is None:
+                    s.set_rep(rep)
+                else:
+                    scheduler.release(rep)  # assigned by hand meanwhile
+            _unassigned.popleft()
+
+def _rebalance() -> int:
+    """Fill idle reps from the unassigned queue, then move not-yet-started PAs off overloaded reps."""
+    _drain_unassigned()
+    moved = 0
+    with _assign_lock:
+        target = scheduler.target_load()
+        for s in _submissions:
+            rep = s.assigned_rep
+            if s.status != "Submitted" or not scheduler.has_rep(rep) or scheduler.load_of(rep) <= target + 1:
+                continue
+            scheduler.release(rep)
+            new_rep = scheduler.pick(_payer_key(s), s.service)
+            if new_rep is None:
+                scheduler.acquire(rep)
+                continue
+            if new_rep == rep:
+                continue
+            with _mutate(s):
+                if s.assigned_rep == rep:
+                    s.set_rep(new_rep)
+                    moved += 1
+                else:
+                    # Reassigned by hand meanwhile; undo our move
+                    scheduler.release(new_rep)
+                    scheduler.acquire(rep)
+    return moved
 
 @router.get("/list")
-def list_submissions():
-    """List all PA submissions (for dashboard views)."""
-    return {"submissions": _submissions}
+def list_submissions(
+    provider_npi: Optional[str] = None,
+    assigned_rep: Optional[str] = None,
+    status: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    List PA submissions (for dashboard views), optionally filtered by provider, rep or status.
+    Carries an ETag; a matching If-None-Match gets 304 without serializing anything.
+    """
+    if provider_npi is None and assigned_rep is None and status is None:
+        etag = f'W/"{_boot_nonce}-r{_revision}"'
+        last_modified = format_datetime(_last_modified, usegmt=True)
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag, last_modified)
+        subs = _submissions
+    else:
+        # Any change to a filtered view touches a PA that matched every filter before or
+        # after it, so it moves each filter's view revision: the ETag needs no scan
+        stamps = [
+            _view_revisions.get((field, value), (0, None)) if value is not None else None
+            for field, value in (("provider", provider_npi), ("rep", assigned_rep), ("status", status))
+        ]
+        etag = 'W/"{}-f{}"'.format(_boot_nonce, ".".join("-" if st is None else str(st[0]) for st in stamps))
+        changed = [st[1] for st in stamps if st is not None and st[1] is not None]
+        last_modified = format_datetime(max(changed) if changed else _last_modified, usegmt=True)
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag, last_modified)
+        with span("list.scan"):
+            subs = [
+                s for s in _submissions
+                if (provider_npi is None or s.provider_npi == provider_npi)
+                and (assigned_rep is None or s.assigned_rep == assigned_rep)
+                and (status is None or s.status == status)
+            ]
+    cache_requests.inc("etag", "miss")
+    with span("list.serialize"):
+        return FastJSONResponse({"submissions": [s.to_dict() for s in subs]},
+                                headers={"ETag": etag, "Last-Modified": last_modified})
 
 @router.post("/update-status")
 def update_status(
     submission_id: str = Form(...),
     new_status: str = Form(...),
-    notes: Optional[str] = Form(None)
+    notes: Optional[str] = Form(None),
+    expected_version: Optional[int] = Form(None),
+    if_match: Optional[str] = Header(None)
 ):
     """
     Reps/Admins update PA request status by ID. Adds to status_history and notes.
+    Pass If-Match or expected_version to fail with 409 instead of overwriting a concurrent edit.
     """
-    for s in _submissions:
-        if s["id"] == submission_id:
-            s["status"] = new_status
-            s["status_history"].append({
-                "status": new_status,
-                "timestamp": datetime.utcnow().isoformat() + "Z"
-            })
-            if notes:
-                s.setdefault("notes", "")
-                s["notes"] += f"\n[{datetime.utcnow().isoformat()}] {notes}"
-            return {"message": "Status updated", "status_history": s["status_history"]}
-    raise HTTPException(404, "Submission not found.")
+    if new_status not in KNOWN_STATUSES:
+        raise HTTPException(400, f"Unknown status. Use one of: {', '.join(KNOWN_STATUSES)}.")
+    s = _find_writable(submission_id)
+    expected = _expected_version(s, if_match, expected_version)
+    freed_rep = False
+    with _mutate(s, expected):
+        now = now_us()
+        transition_latency.record(
+            (now - s.last_transition_us()) / 1e6,
+            s.insurance, s.service, s.assigned_rep
+        )
+        if _is_open(s) and new_status in FINAL_STATUSES:
+            scheduler.release(s.assigned_rep)
+            freed_rep = True
+        elif not _is_open(s) and new_status not in FINAL_STATUSES:
+            scheduler.acquire(s.assigned_rep)
+        s.set_status(new_status, now)
+        if notes:
+            s.notes = (s.notes or "") + f"\n[{datetime.utcnow().isoformat()}] {notes}"
+    if freed_rep:
+        _drain_unassigned()
+    return {"message": "Status updated", "status_history": s.status_history(), "version": s.version}
+
+@router.get("/latency")
+def latency_stats(
+    dimension: str = "global",
+    key: Optional[str] = None,
+    window: Optional[int] = None
+):
+    """
+    Status-transition latency (seconds): p50/p90/p99 and histogram per payer, service, rep or globally.
+    Pass `window` (seconds, at most one week) for a recent view instead of all-time; omit `key` to get every
+    key in the dimension.
+    """
+    if dimension not in DIMENSIONS:
+        raise HTTPException(400, f"Unknown dimension. Use one of: {', '.join(DIMENSIONS)}.")
+    if window is not None and not 0 < window <= MAX_WINDOW:
+        raise HTTPException(400, f"window must be between 1 and {MAX_WINDOW} seconds (168 hours); omit it for all-time.")
+    if dimension == "global":
+        key = "all"
+    keys = [key] if key is not None else transition_latency.keys(dimension)
+    stats = {}
+    for k in keys:
+        snapshot = transition_latency.snapshot(dimension, k, window)
+        if snapshot is not None:
+            stats[k] = snapshot
+    if key is not None and not stats and dimension != "global":
+        raise HTTPException(404, "No latency data for that key.")
+    return {"dimension": dimension, "window": window, "latency": stats}
 
 @router.post("/upload-doc")
 def upload_doc(
@@ -104,33 +517,100 @@ def upload_doc(
     """
     Attach a document to an existing PA submission.
     """
-    for s in _submissions:
-        if s["id"] == submission_id:
-            s.setdefault("documents", []).append({
-                "filename": file.filename,
-                "data": file.file.read()  # In-memory; production should use storage!
-            })
-            return {"message": f"Uploaded {file.filename}"}
-    raise HTTPException(404, "Submission not found.")
+    s = _find_writable(submission_id)
+    data = file.file.read()  # In-memory; production should use storage!
+    with _mutate(s):
+        s.add_document({
+            "filename": file.filename,
+            "data": data
+        })
+    return {"message": f"Uploaded {file.filename}"}
 
 @router.get("/get")
-def get_submission(submission_id: str):
-    """Get one submission by ID (for detail/timeline views)."""
-    for s in _submissions:
-        if s["id"] == submission_id:
-            return {"submission": s}
-    raise HTTPException(404, "Submission not found.")
+def get_submission(
+    submission_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get one submission by ID (for detail/timeline views). Supports If-None-Match.
+    PAs moved to the archive tier are read from there transparently."""
+    s = _find(submission_id) or _archiving.get(submission_id)
+    if s is None:
+        return _get_archived(submission_id, if_none_match)
+    etag = f'W/"{s.id}-{s.version}"'
+    last_modified = _http_date(s.updated_at)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, last_modified)
+    cache_requests.inc("etag", "miss")
+    return FastJSONResponse({"submission": s.to_dict()}, headers={"ETag": etag, "Last-Modified": last_modified})
+
+def _get_archived(submission_id: str, if_none_match: Optional[str]):
+    with span("get.archive"):
+        record = archive().get(submission_id)
+    if record is None:
+        raise HTTPException(404, "Submission not found.")
+    etag = f'W/"{record["id"]}-{record["version"]}"'
+    last_modified = _http_date(to_us(record["updated_at"]))
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, last_modified)
+    cache_requests.inc("etag", "miss")
+    return FastJSONResponse({"submission": record}, headers={"ETag": etag, "Last-Modified": last_modified})
 
 @router.post("/assign-rep")
 def assign_rep(
     submission_id: str = Form(...),
-    assigned_rep: str = Form(...)
+    assigned_rep: str = Form(...),
+    expected_version: Optional[int] = Form(None),
+    if_match: Optional[str] = Header(None)
+):
+    s = _find_writable(submission_id)
+    new_rep = assigned_rep if assigned_rep not in ("", "Unassigned") else None
+    with _mutate(s, _expected_version(s, if_match, expected_version)):
+        if _is_open(s):
+            scheduler.release(s.assigned_rep)
+            scheduler.acquire(new_rep)
+        s.set_rep(new_rep)
+        if new_rep is None and _is_open(s):
+            _unassigned.append(s)
+    _drain_unassigned()
+    return {"message": f"Assigned rep set to {assigned_rep or 'Unassigned'}.", "version": s.version}
+
+@router.get("/reps")
+def list_reps():
+    """Reps known to the auto-assignment scheduler, with open workload and capacity."""
+    waiting = sum(1 for s in _unassigned if s.assigned_rep is None and _is_open(s))
+    return {"reps": scheduler.reps(), "unassigned": waiting}
+
+@router.post("/reps")
+def register_rep(
+    rep: str = Form(...),
+    capacity: Optional[int] = Form(None),
+    payers: Optional[str] = Form(None),
+    specialties: Optional[str] = Form(None)
 ):
+    """
+    Add (or update) a rep in the auto-assignment pool. Payers/specialties are comma-separated affinities;
+    payer names and aliases are mapped to payer IDs. Queued and overloaded work is rebalanced onto the pool afterwards.
+    """
+    load = sum(1 for s in _submissions if s.assigned_rep == rep and _is_open(s))
+    payer_ids = [resolve_payer(p) or p for p in _split(payers)]
+    scheduler.add_rep(rep, capacity, payer_ids, _split(specialties), load=load)
+    moved = _rebalance()
+    return {"message": f"Rep {rep} added to assignment pool.", "reassigned": moved}
+
+@router.post("/reps/remove")
+def remove_rep(rep: str = Form(...)):
+    """Take a rep out of the pool and hand their open PAs to the remaining reps."""
+    if not scheduler.remove_rep(rep):
+        raise HTTPException(404, "Rep not found.")
+    released = 0
     for s in _submissions:
-        if s["id"] == submission_id:
-            s["assigned_rep"] = assigned_rep if assigned_rep != "Unassigned" else None
-            return {"message": f"Assigned rep set to {assigned_rep or 'Unassigned'}."}
-    raise HTTPException(404, "Submission not found.")
+        if s.assigned_rep == rep and _is_open(s):
+            with _mutate(s):
+                s.set_rep(None)
+                _unassigned.append(s)
+            released += 1
+    _drain_unassigned()
+    return {"message": f"Rep {rep} removed from assignment pool.", "reassigned": released}
 
 # ==============================
 # NEW: Manual Eligibility Update
@@ -140,20 +620,97 @@ class EligibilityUpdateRequest(BaseModel):
     eligibility_checked: Optional[bool] = None
     eligibility_method: Optional[str] = None
     eligibility_notes: Optional[str] = None
+    expected_version: Optional[int] = None
 
 @router.post("/update-eligibility")
-def update_eligibility(req: EligibilityUpdateRequest = Body(...)):
+def update_eligibility(
+    req: EligibilityUpdateRequest = Body(...),
+    if_match: Optional[str] = Header(None)
+):
     """
     Update manual eligibility info for a PA submission.
+    Pass If-Match or expected_version to fail with 409 instead of overwriting a concurrent edit.
     """
-    for s in _submissions:
-        if s["id"] == req.submission_id:
-            # Update the fields
-            if req.eligibility_checked is not None:
-                s["eligibility_checked"] = req.eligibility_checked
-            if req.eligibility_method is not None:
-                s["eligibility_method"] = req.eligibility_method
-            if req.eligibility_notes is not None:
-                s["eligibility_notes"] = req.eligibility_notes
-            return {"message": "Eligibility info updated.", "submission": s}
-    raise HTTPException(404, "Submission not found.")
+    s = _find_writable(req.submission_id)
+    with _mutate(s, _expected_version(s, if_match, req.expected_version)):
+        # Update the fields
+        if req.eligibility_checked is not None:
+            s.eligibility_checked = req.eligibility_checked
+        if req.eligibility_method is not None:
+            s.eligibility_method = req.eligibility_method
+        if req.eligibility_notes is not None:
+            s.eligibility_notes = req.eligibility_notes
+    return FastJSONResponse({"message": "Eligibility info updated.", "submission": s.to_dict()})
+
+# ==============================
+# Archive tier (hot/cold)
+# ==============================
+def archive_sweep(max_age_days: float = ARCHIVE_AFTER_DAYS) -> int:
+    """
+    Move finalized PAs not updated for `max_age_days` into a new archive segment.
+    Each one leaves _index under its CAS lock first, so a concurrent edit either lands
+    before it is archived or gets a 409; the list is then rebuilt and the revision bumped.
+    """
+    cutoff = now_us() - int(max_age_days * 86400 * 1_000_000)
+    candidates = [s for s in _submissions if not _is_open(s) and s.updated_at < cutoff]
+    moved = []
+    for s in candidates:
+        with _cas_locks[zlib.crc32(s.id.encode()) % len(_cas_locks)]:
+            if _index.get(s.id) is s and not _is_open(s) and s.updated_at < cutoff:
+                _archiving[s.id] = s
+                del _index[s.id]
+                moved.append(s)
+    if not moved:
+        return 0
+    try:
+        archive().append([s.to_dict() for s in moved])
+    except BaseException:
+        for s in moved:
+            _index[s.id] = s
+            _archiving.pop(s.id, None)
+        raise
+    with _store_lock:
+        _submissions[:] = [s for s in _submissions if s.id in _index]
+    for s in moved:
+        _archiving.pop(s.id, None)
+    stamp = _bump_revision()
+    for s in moved:
+        _stamp_views(_view_keys(s), stamp)
+    return len(moved)
+
+@router.post("/archive/sweep")
+def run_archive_sweep(max_age_days: Optional[float] = Form(None)):
+    """Archive finalized PAs now (also runs periodically in the background)."""
+    archived = archive_sweep(ARCHIVE_AFTER_DAYS if max_age_days is None else max_age_days)
+    return {"archived": archived, "hot": len(_submissions), "archive_total": len(archive())}
+
+@router.get("/export")
+def export_submissions(
+    provider_npi: Optional[str] = None,
+    status: Optional[str] = None,
+    assigned_rep: Optional[str] = None,
+    include_archived: bool = True
+):
+    """
+    All PAs as newline-delimited JSON: the hot store, then the archive read lazily one
+    block at a time (archived lines are passed through without re-serializing when unfiltered).
+    """
+    def wanted(provider: str, st: str, rep: Optional[str]) -> bool:
+        return ((provider_npi is None or provider == provider_npi) and (status is None or st == status)
+                and (assigned_rep is None or rep == assigned_rep))
+
+    def rows():
+        for s in list(_submissions):
+            if wanted(s.provider_npi, s.status, s.assigned_rep):
+                yield dumps(s.to_dict()) + b"\n"
+        if include_archived:
+            filtered = provider_npi is not None or status is not None or assigned_rep is not None
+            for line in archive().iter_lines():
+                if filtered:
+                    record = loads(line)
+                    if not wanted(record["provider_npi"], record["status"], record.get("assigned_rep")):
+                        continue
+                yield line + b"\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="pa-export.ndjson"'})
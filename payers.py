@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, Query
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+import csv
+import os
+import re
+import threading
+
+from profiling import ProfiledRoute
+from ratelimit import admission_control
+from serialization import FastJSONResponse
+
+router = APIRouter(route_class=ProfiledRoute, default_response_class=FastJSONResponse, dependencies=[Depends(admission_control)])
+
+# ========== PAYER DIRECTORY ==========
+# Canonical payer IDs plus names/aliases, loaded once from a bundled CSV into a
+# sorted array of normalized keys. A prefix query is one bisect plus a short
+# forward scan, so suggestions cost microseconds. Every name and alias is also
+# indexed from each word boundary ("Texas" finds "Blue Cross Blue Shield of Texas").
+
+PAYERS_FILE = os.getenv("EPOCHPA_PAYERS_FILE", os.path.join(os.path.dirname(__file__), "data", "payers.csv"))
+MAX_SUGGESTIONS = 20
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Case, spacing and punctuation-insensitive key: 'United Health-Care' -> 'UNITEDHEALTHCARE'."""
+    return _NON_ALNUM.sub("", (text or "").upper())
+
+
+class PayerDirectory:
+    def __init__(self, rows: List[Tuple[str, str, List[str]]]):
+        self.names: Dict[str, str] = {}     # payer_id -> display name
+        self.exact: Dict[str, str] = {}     # normalized name/alias/id -> payer_id
+        entries = set()                     # (key, rank, payer_id); rank 0 = whole name, 1 = later word
+        for payer_id, name, aliases in rows:
+            self.names[payer_id] = name
+            for label in [payer_id, name] + aliases:
+                key = normalize(label)
+                if not key:
+                    continue
+                self.exact.setdefault(key, payer_id)
+                entries.add((key, 0, payer_id))
+                words = label.upper().split()
+                for i in range(1, len(words)):
+                    entries.add((normalize(" ".join(words[i:])), 1, payer_id))
+        ordered = sorted(e for e in entries if e[0])
+        self._keys = [e[0] for e in ordered]
+        self._entries = ordered
+
+    @classmethod
+    def load(cls, path: str = PAYERS_FILE) -> "PayerDirectory":
+        rows = []
+        with open(path, newline="", encoding="utf-8") as f:
+            lines = (line for line in f if line.strip() and not line.startswith("#"))
+            for row in csv.DictReader(lines):
+                aliases = [a.strip() for a in (row.get("aliases") or "").split(";") if a.strip()]
+                rows.append((row["payer_id"].strip(), row["name"].strip(), aliases))
+        return cls(rows)
+
+    def resolve(self, text: Optional[str]) -> Optional[str]:
+        """Canonical payer ID for a name, alias or ID; None if it isn't in the directory."""
+        return self.exact.get(normalize(text))
+
+    def suggest(self, query: str, limit: int = 10) -> List[dict]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        best: Dict[str, int] = {}
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            _, rank, payer_id = self._entries[i]
+            rank = rank if self._keys[i] != prefix else -1  # exact hits first
+            if rank < best.get(payer_id, 2):
+                best[payer_id] = rank
+            i += 1
+        ranked = sorted(best, key=lambda p: (best[p], self.names[p]))[:limit]
+        return [{"payer_id": p, "name": self.names[p]} for p in ranked]
+
+
+_directory: Optional[PayerDirectory] = None
+_load_lock = threading.Lock()
+
+
+def directory() -> PayerDirectory:
+    """Loaded on first use, so importing the app stays cheap."""
+    global _directory
+    if _directory is None:
+        with _load_lock:
+            if _directory is None:
+                _directory = PayerDirectory.load()
+    return _directory
+
+
+def resolve_payer(text: Optional[str]) -> Optional[str]:
+    return directory().resolve(text)
+
+
+@router.get("/payers/suggest")
+def suggest_payers(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS)):
+    """Autocomplete for the insurance field: payers whose name, alias or ID starts with `q`."""
+    return directory().suggest(q, limit)
@@ -0,0 +1,213 @@
+import contextvars
+import functools
+import hmac
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from metrics import route_label
+
+# ========== OPT-IN REQUEST PROFILER ==========
+# A request is profiled when it carries `X-Profile: <EPOCHPA_PROFILE_TOKEN>` (admin
+# only; the token is never sent to regular clients) or is picked by the sampling
+# rate EPOCHPA_PROFILE_SAMPLE_RATE. A background thread then samples the request's
+# own work at a fixed interval for the life of the request: the threadpool thread
+# running its sync endpoint (routers use ProfiledRoute), any worker thread inside
+# one of its span()s, and the event-loop thread only while it is executing this
+# request's coroutine (its middleware frame is on the stack). Other requests'
+# work is never sampled. The result is a collapsed-stack file (flamegraph.pl /
+# speedscope input) plus a JSON sidecar with the route, duration and slowest spans.
+#
+# Unprofiled requests pay one header lookup and one random() call.
+
+PROFILE_TOKEN = os.getenv("EPOCHPA_PROFILE_TOKEN")
+SAMPLE_RATE = float(os.getenv("EPOCHPA_PROFILE_SAMPLE_RATE", "0"))
+INTERVAL = float(os.getenv("EPOCHPA_PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.getenv("EPOCHPA_PROFILE_DIR", "profiles")
+
+# Leaf frames in these files mean the thread is parked, not working
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "socket.py", "ssl.py")
+
+_active: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("active_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.stacks: Dict[str, int] = {}
+        self.spans: List[dict] = []
+        self.samples = 0
+        self._threads: Dict[int, int] = {}      # worker thread ident -> open endpoint/span depth
+        self._threads_lock = threading.Lock()
+        self.loop_thread: Optional[int] = None
+        self.anchor = None                      # this request's ProfilingMiddleware frame
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def enter(self, ident: int):
+        """Sample this worker thread until the matching leave() (no-op on the event-loop thread)."""
+        if ident == self.loop_thread:
+            return
+        with self._threads_lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def leave(self, ident: int):
+        if ident == self.loop_thread:
+            return
+        with self._threads_lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(INTERVAL):
+            with self._threads_lock:
+                watched = list(self._threads)
+            watched.append(self.loop_thread)
+            if any(ident not in names for ident in watched):
+                for t in threading.enumerate():
+                    names[t.ident] = t.name
+            frames = sys._current_frames()
+            for ident in watched:
+                frame = frames.get(ident)
+                if frame is None or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                ours = ident != self.loop_thread
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    ours = ours or frame is self.anchor
+                    frame = frame.f_back
+                if not ours:
+                    continue  # the loop is running some other request
+                stack.append(names.get(ident, str(ident)))
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+
+@contextmanager
+def span(name: str):
+    """Time a named section of a request; recorded only when the request is being profiled."""
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    ident = threading.get_ident()
+    profile.enter(ident)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.leave(ident)
+        profile.spans.append({"name": name, "ms": round((time.perf_counter() - start) * 1000, 3)})
+
+
+def _profiled(endpoint):
+    """Register the threadpool thread running a sync endpoint with the active profile for the whole call."""
+    if inspect.iscoroutinefunction(endpoint) or getattr(endpoint, "_profiled", False):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def call(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        ident = threading.get_ident()
+        profile.enter(ident)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.leave(ident)
+
+    call._profiled = True
+    return call
+
+
+class ProfiledRoute(APIRoute):
+    """Route class for APIRouter(route_class=...): sync endpoints are sampled for their whole body."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+def _wants_profile(scope) -> bool:
+    if PROFILE_TOKEN:
+        for key, value in scope.get("headers", ()):
+            if key == b"x-profile":
+                return hmac.compare_digest(value, PROFILE_TOKEN.encode("latin-1"))
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def _write(profile: RequestProfile, scope, status: int, duration: float) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    route = route_label(scope)
+    slug = route.strip("/").replace("/", "_") or "root"
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{slug}-{int(duration * 1000)}ms-{random.getrandbits(24):06x}"
+    with open(os.path.join(PROFILE_DIR, profile_id + ".collapsed"), "w") as f:
+        for stack, count in sorted(profile.stacks.items()):
+            f.write(f"{stack} {count}\n")
+    with open(os.path.join(PROFILE_DIR, profile_id + ".json"), "w") as f:
+        json.dump({
+            "route": route,
+            "path": scope["path"],
+            "method": scope["method"],
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "samples": profile.samples,
+            "interval_ms": INTERVAL * 1000,
+            "slowest_spans": sorted(profile.spans, key=lambda s: s["ms"], reverse=True)[:20],
+        }, f, indent=2)
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that runs the sampling profiler for opted-in requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile()
+        token = _active.set(profile)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        profile.loop_thread = threading.get_ident()
+        profile.anchor = sys._getframe()
+        start = time.perf_counter()
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _active.reset(token)
+            # Joining the sampler and writing files would block the event loop for every other request
+            await run_in_threadpool(profile.stop)
+            await run_in_threadpool(_write, profile, scope, status["code"], duration)
@@ -0,0 +1,211 @@
+import hashlib
+import hmac
+import math
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from metrics import registry
+
+# ========== ADMISSION CONTROL / RATE LIMITING ==========
+# Inbound: token buckets keyed by (route, caller). A logged-in caller is keyed on
+# the user in its signed X-EpochPA-Identity token (issued by /auth/login), which a
+# client can't forge to borrow or dodge someone else's bucket. Anonymous callers
+# are keyed on the client address, split by X-Provider-Id / ?provider_npi= so
+# users behind one proxy (e.g. the Streamlit server) don't share a bucket. Those
+# claimed ids are client-chosen, so anonymous traffic also passes a per-(route,
+# address) ceiling bucket (<name>_client) that rotating them can't escape; /submit
+# also limits on the provider_npi in the body. Over-limit gets 429 + Retry-After.
+# Outbound: one shared bucket for Availity calls. Callers queue (FIFO, by slot
+# reservation) instead of failing, up to a maximum wait.
+#
+# Limits are "rate/burst" (tokens per second / bucket size), overridable with
+# EPOCHPA_RATELIMIT_<NAME>, e.g. EPOCHPA_RATELIMIT_SUBMIT=1/10.
+
+DEFAULT_LIMITS = {
+    "submit": "2/20",            # per provider
+    "list": "5/30",
+    "default": "20/100",
+    "submit_client": "10/60",    # per client address, anonymous callers only
+    "list_client": "25/150",
+    "default_client": "100/500",
+    "availity": "10/20",         # shared outbound quota
+}
+MAX_KEYS = 50_000                # idle buckets beyond this are evicted (LRU)
+AVAILITY_MAX_WAIT = float(os.getenv("EPOCHPA_AVAILITY_MAX_WAIT", "10"))
+IDENTITY_TTL = int(os.getenv("EPOCHPA_IDENTITY_TTL_SECONDS", str(12 * 3600)))
+# Set this in production: with the per-process default, a token from one worker isn't
+# verifiable in another and those calls fall back to anonymous keying.
+_IDENTITY_SECRET = (os.getenv("EPOCHPA_IDENTITY_SECRET") or secrets.token_hex(32)).encode()
+
+rate_limited = registry.counter(
+    "epochpa_rate_limited_total", "Requests rejected with 429 by route.", ("route",))
+availity_wait = registry.histogram(
+    "epochpa_availity_queue_wait_seconds", "Time outbound Availity calls waited for quota.",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+availity_rejected = registry.counter(
+    "epochpa_availity_quota_rejected_total", "Availity calls dropped after waiting too long for quota.")
+
+
+def _limit(name: str) -> Tuple[float, float]:
+    spec = os.getenv(f"EPOCHPA_RATELIMIT_{name.upper()}", DEFAULT_LIMITS.get(name, DEFAULT_LIMITS["default"]))
+    rate, _, burst = spec.partition("/")
+    return float(rate), float(burst or rate)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "lock")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token. Returns 0 on success, else seconds until one is available."""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Reserve the next token, going into debt; returns how long to wait, or None if over max_wait."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate)
+            if wait > max_wait:
+                self.tokens += 1
+                return None
+            return wait
+
+
+class KeyedLimiter:
+    """Token buckets per key, with LRU eviction so memory stays bounded."""
+
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._limits: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, name: str, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get((name, key))
+            if bucket is None:
+                limits = self._limits.get(name)
+                if limits is None:
+                    limits = self._limits[name] = _limit(name)
+                bucket = self._buckets[(name, key)] = TokenBucket(*limits)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end((name, key))
+            return bucket
+
+    def check(self, name: str, key: str, route: str):
+        retry_after = self._bucket(name, key).try_acquire()
+        if retry_after:
+            rate_limited.inc(route)
+            raise HTTPException(
+                429, "Too many requests; slow down and retry.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+
+limiter = KeyedLimiter()
+
+
+def _sign(payload: str) -> str:
+    return hmac.new(_IDENTITY_SECRET, payload.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_identity(user: str) -> str:
+    """Signed 'user|expiry|mac' token the client sends back as X-EpochPA-Identity."""
+    payload = f"{user}|{int(time.time()) + IDENTITY_TTL}"
+    return f"{payload}|{_sign(payload)}"
+
+
+def verified_identity(token: Optional[str]) -> Optional[str]:
+    """The user a valid, unexpired identity token was issued to, else None."""
+    if not token:
+        return None
+    payload, _, mac = token.rpartition("|")
+    user, _, expires = payload.rpartition("|")
+    if not user or not hmac.compare_digest(mac.encode(), _sign(payload).encode()):
+        return None
+    try:
+        if int(expires) < time.time():
+            return None
+    except ValueError:
+        return None
+    return user
+
+
+def _client_address(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def provider_key(request: Request) -> str:
+    user = verified_identity(request.headers.get("x-epochpa-identity"))
+    if user is not None:
+        return f"user:{user}"
+    client = _client_address(request)
+    claimed = request.headers.get("x-provider-id") or request.query_params.get("provider_npi")
+    return f"{client}|{claimed}" if claimed else client
+
+
+async def admission_control(request: Request):
+    """Router dependency: per-(route, provider) token bucket, under a per-address ceiling when anonymous."""
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    name = route.rsplit("/", 1)[-1] if route.endswith(("/submit", "/list")) else "default"
+    key = provider_key(request)
+    if not key.startswith("user:"):
+        # Checked first, so rotated ids can't mint buckets (and churn the LRU) past the ceiling
+        limiter.check(f"{name}_client", f"{route}|addr:{_client_address(request)}", route)
+    limiter.check(name, f"{route}|{key}", route)
+
+
+def limit_provider(name: str, provider: str, route: str):
+    """Limit inside a handler on a provider ID only known after parsing the body."""
+    limiter.check(name, f"{route}|npi:{provider}", route)
+
+
+# ----- Outbound Availity quota -----
+_availity_bucket = TokenBucket(*_limit("availity"))
+_availity_waiting = 0
+_waiting_lock = threading.Lock()
+
+registry.gauge("epochpa_availity_queue_depth", "Availity calls currently waiting for quota.", lambda: _availity_waiting)
+
+
+def acquire_availity(max_wait: float = AVAILITY_MAX_WAIT) -> bool:
+    """Block until the shared Availity quota allows another call. False if the queue is too long."""
+    global _availity_waiting
+    wait = _availity_bucket.reserve(max_wait)
+    if wait is None:
+        availity_rejected.inc()
+        return False
+    availity_wait.observe(wait)
+    if wait > 0:
+        with _waiting_lock:
+            _availity_waiting += 1
+        try:
+            time.sleep(wait)
+        finally:
+            with _waiting_lock:
+                _availity_waiting -= 1
+    return True
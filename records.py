@@ -0,0 +1,177 @@
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# ========== COMPACT SUBMISSION RECORDS ==========
+# The store holds one Submission per PA instead of a dict per PA plus a dict per
+# history entry. Slots drop the per-instance __dict__ and the repeated key
+# strings; low-cardinality strings (status, payer, rep, provider, service,
+# diagnosis) are interned so every record points at one shared object; times are
+# integer microseconds since the epoch (UTC); the status history is two parallel
+# arrays (status code, timestamp) at 10 bytes per entry. to_dict() rebuilds the
+# JSON shape the API has always returned, and is only called at the API edge.
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def now_us() -> int:
+    return time.time_ns() // 1000
+
+
+def to_us(iso_timestamp: str) -> int:
+    """'2024-05-01T12:00:00.123456Z' -> microseconds since the epoch."""
+    delta = datetime.fromisoformat(iso_timestamp.rstrip("Z").replace("+00:00", "")) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def to_iso(us: int) -> str:
+    """Inverse of to_us; same format as datetime.utcnow().isoformat() + 'Z'."""
+    return (_EPOCH + timedelta(microseconds=us)).isoformat() + "Z"
+
+
+def intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+class Symbols:
+    """Small-integer codes for a bounded set of strings (e.g. statuses); codes fit array('H')."""
+
+    def __init__(self, *initial: str, max_size: int = 1 << 16):
+        self.max_size = max_size
+        self._codes = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+        for name in initial:
+            self.code(name)
+
+    def code(self, name: str) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(name)
+                if code is None:
+                    if len(self._names) >= self.max_size:
+                        raise ValueError(f"symbol table full ({self.max_size} names)")
+                    code = self._codes[name] = len(self._names)
+                    self._names.append(sys.intern(name))
+        return code
+
+    def name(self, code: int) -> str:
+        return self._names[code]
+
+
+KNOWN_STATUSES = ("Submitted", "In Review", "Approved", "Denied")
+STATUSES = Symbols(*KNOWN_STATUSES)
+
+
+class Submission:
+    __slots__ = (
+        "id", "provider_npi", "patient_name", "patient_dob", "insurance", "member_id", "service",
+        "diagnosis_code", "notes", "possible_duplicate_of", "status", "history_status", "history_at",
+        "documents", "code_warnings", "payer_id", "assigned_rep", "eligibility_response",
+        "eligibility_checked", "eligibility_method", "eligibility_notes", "version", "updated_at",
+    )
+
+    def __init__(self, id: str, provider_npi: str, patient_name: str, patient_dob: str, insurance: str,
+                 member_id: str, service: str, diagnosis_code: str, notes: Optional[str] = None):
+        self.id = id
+        self.provider_npi = intern(provider_npi)
+        self.patient_name = patient_name
+        self.patient_dob = patient_dob
+        self.insurance = intern(insurance)
+        self.member_id = member_id
+        self.service = intern(service)
+        self.diagnosis_code = intern(diagnosis_code)
+        self.notes = notes
+        self.possible_duplicate_of = None
+        self.status = None
+        self.history_status = array("H")
+        self.history_at = array("q")
+        self.documents = None            # list, created on first attachment
+        self.code_warnings = None
+        self.payer_id = None
+        self.assigned_rep = None
+        self.eligibility_response = None
+        self.eligibility_checked = None
+        self.eligibility_method = None
+        self.eligibility_notes = None
+        self.version = 0
+        self.updated_at = 0
+
+    # ----- mutation helpers -----
+    def set_status(self, status: str, at_us: Optional[int] = None):
+        self.status = STATUSES.name(STATUSES.code(status))
+        self.history_status.append(STATUSES.code(status))
+        self.history_at.append(now_us() if at_us is None else at_us)
+
+    def last_transition_us(self) -> int:
+        return self.history_at[-1]
+
+    def set_rep(self, rep: Optional[str]):
+        self.assigned_rep = intern(rep)
+
+    def set_payer(self, payer_id: Optional[str]):
+        self.payer_id = intern(payer_id)
+
+    def add_document(self, document: dict):
+        if self.documents is None:
+            self.documents = []
+        self.documents.append(document)
+
+    # ----- API edge -----
+    def status_history(self) -> List[dict]:
+        return [{"status": STATUSES.name(code), "timestamp": to_iso(at)}
+                for code, at in zip(self.history_status, self.history_at)]
+
+    def to_dict(self) -> dict:
+        data = {
+            "provider_npi": self.provider_npi,
+            "patient_name": self.patient_name,
+            "patient_dob": self.patient_dob,
+            "insurance": self.insurance,
+            "member_id": self.member_id,
+            "service": self.service,
+            "diagnosis_code": self.diagnosis_code,
+            "notes": self.notes,
+            "id": self.id,
+            "possible_duplicate_of": self.possible_duplicate_of,
+            "status": self.status,
+            "status_history": self.status_history(),
+            "documents": self.documents or [],
+            "code_warnings": self.code_warnings or [],
+            "payer_id": self.payer_id,
+            "assigned_rep": self.assigned_rep,
+            "eligibility_response": self.eligibility_response,
+            "version": self.version,
+            "updated_at": to_iso(self.updated_at) if self.updated_at else None,
+        }
+        # Manual eligibility fields only appear once set, as before
+        for field in ("eligibility_checked", "eligibility_method", "eligibility_notes"):
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Submission":
+        s = cls(data["id"], data["provider_npi"], data["patient_name"], data["patient_dob"], data["insurance"],
+                data["member_id"], data["service"], data["diagnosis_code"], data.get("notes"))
+        s.possible_duplicate_of = data.get("possible_duplicate_of")
+        for entry in data.get("status_history") or []:
+            s.set_status(entry["status"], to_us(entry["timestamp"]))
+        if s.status is None or data.get("status") not in (None, s.status):
+            s.status = intern(data.get("status") or "Submitted")
+        s.documents = list(data["documents"]) if data.get("documents") else None
+        s.code_warnings = data.get("code_warnings") or None
+        s.set_payer(data.get("payer_id"))
+        s.set_rep(data.get("assigned_rep"))
+        s.eligibility_response = data.get("eligibility_response")
+        s.eligibility_checked = data.get("eligibility_checked")
+        s.eligibility_method = data.get("eligibility_method")
+        s.eligibility_notes = data.get("eligibility_notes")
+        s.version = data.get("version", 0)
+        s.updated_at = to_us(data["updated_at"]) if data.get("updated_at") else 0
+        return s
@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import date, datetime
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; falls back to the stdlib encoder
+    orjson = None
+
+# ========== FAST JSON RESPONSES ==========
+# FastJSONResponse skips FastAPI's jsonable_encoder walk when a route returns it
+# directly, and renders with orjson when installed. Naive datetimes are treated as
+# UTC ("...Z"), and raw bytes (uploaded document data) go out base64-encoded
+# instead of failing to UTF-8 decode.
+
+
+def _default(obj):
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(obj)).decode("ascii")
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat() + ("Z" if obj.tzinfo is None else "")
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -6,6 +6,10 @@ load_dotenv()  # This loads .env file values into environment variables
 import streamlit as st
 import requests
 import pandas as pd
+import hashlib
+import json
+import time
+import uuid
 from datetime import datetime
 
 API_BASE = "https://epochpa-backend.onrender.com/intake"
@@ -71,6 +75,94 @@ def compute_turnaround(sub):
     end = pd.to_datetime(approved[-1]["timestamp"])
     return (end - start).total_seconds() / 3600
 
+def api_headers(extra=None):
+    """
+    Headers for every backend call. Rate limits are per user: the signed identity token from login
+    is what the backend keys on; X-Provider-Id only splits anonymous traffic from this one server IP.
+    """
+    headers = {}
+    if st.session_state.get("username"):
+        headers["X-Provider-Id"] = st.session_state.username
+    if st.session_state.get("identity_token"):
+        headers["X-EpochPA-Identity"] = st.session_state.identity_token
+    headers.update(extra or {})
+    return headers
+
+def fetch_submissions(params=None, headers=None):
+    """GET /list with If-None-Match; reuses the cached payload when the backend answers 304."""
+    params = params or {}
+    cache = st.session_state.setdefault("list_cache", {})
+    cache_key = tuple(sorted(params.items()))
+    headers = api_headers(headers)
+    cached = cache.get(cache_key)
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
+    resp = requests.get(f"{API_BASE}/list", params=params, headers=headers)
+    if resp.status_code == 304 and cached:
+        return cached["submissions"]
+    submissions = resp.json().get("submissions", [])
+    if resp.headers.get("ETag"):
+        cache[cache_key] = {"etag": resp.headers["ETag"], "submissions": submissions}
+    return submissions
+
+def fetch_export(params=None):
+    """GET /export (NDJSON, archived PAs included) for downloads; /list only covers the live store."""
+    headers = api_headers()
+    params = {k: v for k, v in (params or {}).items() if v is not None}
+    with requests.get(f"{API_BASE}/export", params=params, headers=headers, stream=True, timeout=300) as resp:
+        resp.raise_for_status()
+        return [json.loads(line) for line in resp.iter_lines() if line]
+
+UPLOAD_RETRIES = 5
+
+class UploadFailed:
+    """Returned by upload_file_resumable when retries run out, so a stale 200 from an earlier chunk isn't mistaken for success."""
+    status_code = None
+
+    def __init__(self, text):
+        self.text = text
+
+def upload_file_resumable(submission_id, f):
+    """
+    Send an uploaded file through the resumable upload API one chunk at a time.
+    After a dropped connection it asks the backend for the current offset and resends only what is missing.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    resp = requests.post(f"{API_BASE}/uploads", json={
+        "submission_id": submission_id, "filename": f.name, "size": size, "content_type": getattr(f, "type", None)
+    }, headers=api_headers())
+    if resp.status_code != 201:
+        return resp
+    session = resp.json()
+    upload_url = f"{API_BASE}/uploads/{session['upload_id']}"
+    chunk_size = session["chunk_size"]
+    offset, failures = 0, 0
+    while offset < size:
+        f.seek(offset)
+        chunk = f.read(chunk_size)
+        try:
+            resp = requests.put(upload_url, params={"offset": offset}, data=chunk,
+                                headers=api_headers({"X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()}), timeout=120)
+            if resp.status_code == 200:
+                offset = resp.json()["offset"]
+                failures = 0
+                continue
+            if resp.status_code not in (409, 422) and resp.status_code < 500:
+                return resp
+        except requests.RequestException:
+            pass
+        failures += 1
+        if failures > UPLOAD_RETRIES:
+            return UploadFailed(f"gave up at byte {offset} of {size} after {UPLOAD_RETRIES} retries")
+        time.sleep(min(2 ** failures, 30))
+        try:
+            offset = requests.get(upload_url, headers=api_headers(), timeout=30).json()["offset"]
+        except Exception:
+            pass
+    return requests.post(f"{upload_url}/finalize", headers=api_headers())
+
 def status_count(subs):
     return pd.Series([s["status"] for s in subs]).value_counts() if subs else pd.Series()
 
@@ -96,7 +188,7 @@ def show_register():
                     "username": form_username
                 }
                 try:
-                    resp = requests.post(f"{API_BASE}/auth/register", json=payload)
+                    resp = requests.post(f"{API_BASE}/auth/register", json=payload, headers=api_headers())
                     # DEBUG output
                     st.write("Status code:", resp.status_code)
                     st.write("Response text:", resp.text)
@@ -122,7 +214,7 @@ def show_confirm():
     st.title("🔒 Confirm Email")
     token = st.text_input("Confirmation Token")
     if st.button("Confirm"):
-        resp = requests.post(f"{API_BASE}/auth/confirm", json={"token": token})
+        resp = requests.post(f"{API_BASE}/auth/confirm", json={"token": token}, headers=api_headers())
         if resp.status_code == 200:
             st.success("Email confirmed! You can now log in.")
         else:
@@ -137,12 +229,13 @@ def show_login():
     if st.button("Login"):
         try:
             payload = {"email": email, "password": password}
-            resp = requests.post(f"{API_BASE}/auth/login", json=payload)
+            resp = requests.post(f"{API_BASE}/auth/login", json=payload, headers=api_headers())
             if resp.status_code == 200:
                 user_data = resp.json().get("user", {})
                 st.session_state.email = user_data.get("email")
                 st.session_state.role = user_data.get("role")
                 st.session_state.username = user_data.get("email")
+                st.session_state.identity_token = resp.json().get("identity_token")
                 st.session_state.logged_provider = user_data.get("role") == "provider"
                 st.session_state.logged_rep = user_data.get("role") == "rep"
                 st.session_state.logged_admin = user_data.get("role") == "admin"
@@ -171,6 +264,17 @@ def show_provider():
     st.header("Submit a New PA Request")
     provider_npi = st.session_state.username
 
+    payer_query = st.text_input("Look up payer", "", help="Type a payer name or alias to find its payer ID")
+    if payer_query:
+        try:
+            matches = requests.get(f"{API_BASE}/payers/suggest", params={"q": payer_query}, headers=api_headers(), timeout=5).json()
+            if matches:
+                st.caption(" · ".join(f"{m['name']} ({m['payer_id']})" for m in matches))
+            else:
+                st.caption("No matching payer in the directory.")
+        except Exception:
+            pass
+
     with st.form("submit_pa_form", clear_on_submit=True):
         patient_name = st.text_input("Patient Name", "")
         patient_dob = st.date_input("Patient DOB")
@@ -192,11 +296,24 @@ def show_provider():
                 "diagnosis_code": diagnosis_code,
                 "notes": notes
             }
+            # One key per intended submission: reruns and retries of it can't create a second PA
+            submit_key = st.session_state.setdefault("submit_idempotency_key", str(uuid.uuid4()))
             try:
-                resp = requests.post(f"{API_BASE}/submit", json=payload)
-                if resp.status_code == 201:
+                resp = requests.post(f"{API_BASE}/submit", json=payload, headers=api_headers({"Idempotency-Key": submit_key}))
+                if resp.status_code in (200, 201, 422):
+                    st.session_state.pop("submit_idempotency_key", None)
+                if resp.status_code == 200:
+                    st.info("This matches an open PA request; the notes were added to it.")
+                elif resp.status_code == 201:
                     st.success("PA request submitted successfully.")
-                    st.rerun()
+                    created = resp.json()["data"]
+                    if created.get("possible_duplicate_of"):
+                        st.warning("A PA for this patient, service and diagnosis was submitted recently.")
+                    for issue in created.get("code_warnings") or []:
+                        hint = ", ".join(c["code"] for c in issue.get("suggestions", []))
+                        st.warning(f"{issue['field']} {issue['code']}: {issue['message']}" + (f" Did you mean {hint}?" if hint else ""))
+                    if not created.get("code_warnings") and not created.get("possible_duplicate_of"):
+                        st.rerun()
                 else:
                     st.error(f"Failed to submit PA request: {resp.text}")
             except Exception as e:
@@ -206,8 +323,7 @@ def show_provider():
     st.subheader("Your PA Analytics")
     try:
         headers = {"Authorization": f"Bearer demo-token"}
-        resp = requests.get(f"{API_BASE}/list", headers=headers)
-        submissions = resp.json().get("submissions", [])
+        submissions = fetch_submissions({"provider_npi": provider_npi}, headers=headers)
     except Exception as e:
         st.error(f"Error loading submissions: {e}")
         return
@@ -238,9 +354,7 @@ def show_provider():
         files = st.file_uploader(f"Select files for {sub['id']}", accept_multiple_files=True, key=f"file_{sub['id']}")
         if st.button(f"Upload Documents for {sub['id']}", key=f"upload_{sub['id']}") and files:
             for f in files:
-                files_payload = {"file": (f.name, f.getvalue())}
-                data = {"submission_id": sub['id']}
-                resp = requests.post(f"{API_BASE}/upload-doc", files=files_payload, data=data)
+                resp = upload_file_resumable(sub['id'], f)
                 if resp.status_code == 200:
                     st.success(f"Uploaded {f.name}")
                 else:
@@ -257,12 +371,12 @@ def show_provider():
         st.write("---")
 
     if st.button("Download My PA Requests (CSV)"):
-        df = pd.DataFrame(my_submissions)
+        df = pd.DataFrame(fetch_export({"provider_npi": provider_npi}))
         df.to_csv("my_pas.csv", index=False)
         with open("my_pas.csv", "rb") as f:
             st.download_button("Download CSV", f, file_name="my_pas.csv")
     if st.button("Download My PA Requests (Excel)"):
-        df = pd.DataFrame(my_submissions)
+        df = pd.DataFrame(fetch_export({"provider_npi": provider_npi}))
         df.to_excel("my_pas.xlsx", index=False)
         with open("my_pas.xlsx", "rb") as f:
             st.download_button("Download Excel", f, file_name="my_pas.xlsx")
@@ -275,8 +389,7 @@ def show_rep():
     st.title("👥 Rep Dashboard")
     username = st.session_state.username
     try:
-        resp = requests.get(f"{API_BASE}/list")
-        submissions = resp.json().get("submissions", [])
+        submissions = fetch_submissions({"assigned_rep": username})
     except Exception as e:
         st.error(f"Error loading submissions: {e}")
         return
@@ -307,7 +420,8 @@ def show_rep():
                     pa_id = options[sel]
                     resp = requests.post(
                         f"{API_BASE}/update-status",
-                        data={"submission_id": pa_id, "new_status": new_status, "notes": notes}
+                        data={"submission_id": pa_id, "new_status": new_status, "notes": notes},
+                        headers=api_headers()
                     )
                 st.success(f"Updated {len(selected_ids)} requests.")
                 st.rerun()
@@ -348,20 +462,22 @@ def show_rep():
                 "eligibility_checked": checked,
                 "eligibility_method": method,
                 "eligibility_notes": notes,
+                "expected_version": sub.get("version"),
             }
+            # Save the fields first: uploads bump the PA's version
+            resp = requests.post(f"{API_BASE}/update-eligibility", json=payload, headers=api_headers())
+            if resp.status_code == 200:
+                st.success("Eligibility info updated!")
+            elif resp.status_code == 409:
+                st.warning("Someone else changed this PA since you loaded it. Refresh and try again.")
+            else:
+                st.error(f"Update failed: {resp.text}")
             for file in uploaded_files:
-                files = {"file": (file.name, file.getvalue())}
-                data = {"submission_id": sub["id"]}
-                resp = requests.post(f"{API_BASE}/upload-doc", files=files, data=data)
+                resp = upload_file_resumable(sub["id"], file)
                 if resp.status_code == 200:
                     st.success(f"Uploaded {file.name}")
                 else:
                     st.error(f"Failed to upload {file.name}: {resp.text}")
-            resp = requests.post(f"{API_BASE}/update-eligibility", json=payload)
-            if resp.status_code == 200:
-                st.success("Eligibility info updated!")
-            else:
-                st.error(f"Update failed: {resp.text}")
         if eligibility_evidence:
             st.write("Uploaded Eligibility Documents:")
             for doc in eligibility_evidence:
@@ -377,22 +493,25 @@ def show_rep():
         if st.button(f"Update Status for {sub['id']}", key=f"update_{sub['id']}"):
             resp = requests.post(
                 f"{API_BASE}/update-status",
-                data={"submission_id": sub['id'], "new_status": new_status, "notes": notes}
+                data={"submission_id": sub['id'], "new_status": new_status, "notes": notes, "expected_version": sub.get("version")},
+                headers=api_headers()
             )
             if resp.status_code == 200:
                 st.success("Status updated!")
                 st.rerun()
+            elif resp.status_code == 409:
+                st.warning("Someone else changed this PA since you loaded it. Refresh and try again.")
             else:
                 st.error("Failed to update status.")
         st.write("---")
     if my_submissions:
         if st.button("Download My PA Requests (CSV)"):
-            df = pd.DataFrame(my_submissions)
+            df = pd.DataFrame(fetch_export({"assigned_rep": username}))
             df.to_csv(f"rep_{username}_pas.csv", index=False)
             with open(f"rep_{username}_pas.csv", "rb") as f:
                 st.download_button("Download CSV", f, file_name=f"rep_{username}_pas.csv")
         if st.button("Download My PA Requests (Excel)"):
-            df = pd.DataFrame(my_submissions)
+            df = pd.DataFrame(fetch_export({"assigned_rep": username}))
             df.to_excel(f"rep_{username}_pas.xlsx", index=False)
             with open(f"rep_{username}_pas.xlsx", "rb") as f:
                 st.download_button("Download Excel", f, file_name=f"rep_{username}_pas.xlsx")
@@ -404,8 +523,7 @@ def show_admin():
         return
     st.title("🛠️ Admin Dashboard")
     try:
-        resp = requests.get(f"{API_BASE}/list")
-        submissions = resp.json().get("submissions", [])
+        submissions = fetch_submissions()
     except Exception as e:
         st.error(f"Error loading submissions: {e}")
         return
@@ -454,7 +572,11 @@ def show_admin():
     if selected_status != "All":
         filtered_subs = [s for s in filtered_subs if s.get("status") == selected_status]
     if st.button("📥 Download All PA Data as Excel"):
-        df = pd.DataFrame(filtered_subs)
+        df = pd.DataFrame(fetch_export({
+            "assigned_rep": None if selected_rep == "All" else selected_rep,
+            "provider_npi": None if selected_provider == "All" else selected_provider,
+            "status": None if selected_status == "All" else selected_status,
+        }))
         df.to_excel("PA_Requests.xlsx", index=False)
         with open("PA_Requests.xlsx", "rb") as f:
             st.download_button("Download Excel", f, file_name="PA_Requests.xlsx")
@@ -473,11 +595,13 @@ def show_admin():
             key=f"assign_{sub['id']}"
         )
         if st.button(f"Update Assignment for {sub['id']}", key=f"assignbtn_{sub['id']}"):
-            data = {"submission_id": sub['id'], "assigned_rep": new_rep if new_rep != "Unassigned" else ""}
-            resp = requests.post(f"{API_BASE}/assign-rep", data=data)
+            data = {"submission_id": sub['id'], "assigned_rep": new_rep if new_rep != "Unassigned" else "", "expected_version": sub.get("version")}
+            resp = requests.post(f"{API_BASE}/assign-rep", data=data, headers=api_headers())
             if resp.status_code == 200:
                 st.success(f"Assigned to {new_rep}")
                 st.rerun()
+            elif resp.status_code == 409:
+                st.warning("Someone else changed this PA since you loaded it. Refresh and try again.")
             else:
                 st.error(f"Assignment failed: {resp.text}")
         st.markdown("#### Manual Eligibility Update")
@@ -507,20 +631,22 @@ def show_admin():
                 "eligibility_checked": checked,
                 "eligibility_method": method,
                 "eligibility_notes": notes,
+                "expected_version": sub.get("version"),
             }
+            # Save the fields first: uploads bump the PA's version
+            resp = requests.post(f"{API_BASE}/update-eligibility", json=payload, headers=api_headers())
+            if resp.status_code == 200:
+                st.success("Eligibility info updated!")
+            elif resp.status_code == 409:
+                st.warning("Someone else changed this PA since you loaded it. Refresh and try again.")
+            else:
+                st.error(f"Update failed: {resp.text}")
             for file in uploaded_files:
-                files = {"file": (file.name, file.getvalue())}
-                data = {"submission_id": sub["id"]}
-                resp = requests.post(f"{API_BASE}/upload-doc", files=files, data=data)
+                resp = upload_file_resumable(sub["id"], file)
                 if resp.status_code == 200:
                     st.success(f"Uploaded {file.name}")
                 else:
                     st.error(f"Failed to upload {file.name}: {resp.text}")
-            resp = requests.post(f"{API_BASE}/update-eligibility", json=payload)
-            if resp.status_code == 200:
-                st.success("Eligibility info updated!")
-            else:
-                st.error(f"Update failed: {resp.text}")
         if eligibility_evidence:
             st.write("Uploaded Eligibility Documents:")
             for doc in eligibility_evidence:
@@ -536,11 +662,14 @@ def show_admin():
         if st.button(f"Update Status for {sub['id']}", key=f"admin_update_{sub['id']}"):
             resp = requests.post(
                 f"{API_BASE}/update-status",
-                data={"submission_id": sub['id'], "new_status": new_status, "notes": notes}
+                data={"submission_id": sub['id'], "new_status": new_status, "notes": notes, "expected_version": sub.get("version")},
+                headers=api_headers()
             )
             if resp.status_code == 200:
                 st.success("Status updated!")
                 st.rerun()
+            elif resp.status_code == 409:
+                st.warning("Someone else changed this PA since you loaded it. Refresh and try again.")
             else:
                 st.error("Failed to update status.")
         st.write("---")
@@ -0,0 +1,205 @@
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Optional, Dict
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from pa import _find_writable, _mutate
+from profiling import ProfiledRoute
+from ratelimit import admission_control
+
+router = APIRouter(route_class=ProfiledRoute, dependencies=[Depends(admission_control)])
+
+# ========== RESUMABLE CHUNKED UPLOADS ==========
+# Large clinical attachments are sent as a session of chunks instead of one
+# multipart POST:
+#   POST   /uploads                      -> create session, returns upload_id
+#   PUT    /uploads/{id}?offset=N        -> append one chunk (X-Chunk-SHA256 checked)
+#   GET    /uploads/{id}                 -> current offset, to resume after a drop
+#   POST   /uploads/{id}/finalize        -> verify and attach to the submission
+#   DELETE /uploads/{id}                 -> abandon
+# Chunks are streamed straight to a file on disk, so memory per request is
+# bounded by the read buffer regardless of file size.
+
+UPLOAD_DIR = os.getenv("EPOCHPA_UPLOAD_DIR", "uploads_tmp")
+DOCUMENT_DIR = os.getenv("EPOCHPA_DOCUMENT_DIR", "documents")
+MAX_UPLOAD_BYTES = int(os.getenv("EPOCHPA_MAX_UPLOAD_BYTES", str(1024 ** 3)))
+MAX_CHUNK_BYTES = int(os.getenv("EPOCHPA_MAX_CHUNK_BYTES", str(16 * 1024 ** 2)))
+DEFAULT_CHUNK_BYTES = 4 * 1024 ** 2
+SESSION_TTL = int(os.getenv("EPOCHPA_UPLOAD_TTL_SECONDS", str(24 * 3600)))
+
+
+class UploadSession:
+    __slots__ = ("id", "submission_id", "filename", "size", "sha256", "content_type", "path", "offset", "touched", "lock")
+
+    def __init__(self, submission_id: str, filename: str, size: int, sha256: Optional[str], content_type: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.submission_id = submission_id
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256.lower() if sha256 else None
+        self.content_type = content_type
+        self.path = os.path.join(UPLOAD_DIR, self.id + ".part")
+        self.offset = 0
+        self.touched = time.time()
+        self.lock = threading.Lock()
+
+    def status(self) -> dict:
+        return {"upload_id": self.id, "submission_id": self.submission_id, "filename": self.filename,
+                "size": self.size, "offset": self.offset, "complete": self.offset == self.size}
+
+
+_sessions: Dict[str, UploadSession] = {}
+
+
+def _expire_sessions():
+    cutoff = time.time() - SESSION_TTL
+    for upload_id, session in list(_sessions.items()):
+        if session.touched < cutoff:
+            _sessions.pop(upload_id, None)
+            if os.path.exists(session.path):
+                os.remove(session.path)
+
+
+def _get_session(upload_id: str) -> UploadSession:
+    session = _sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(404, "Upload session not found or expired.")
+    return session
+
+
+def _safe_name(filename: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename)) or "upload"
+
+
+class CreateUploadRequest(BaseModel):
+    submission_id: str
+    filename: str
+    size: int
+    sha256: Optional[str] = None        # whole-file checksum, verified on finalize
+    content_type: Optional[str] = None
+
+
+@router.post("/uploads", status_code=201)
+def create_upload(req: CreateUploadRequest):
+    """Start a resumable upload for a document attached to a PA submission."""
+    _find_writable(req.submission_id)
+    if req.size < 0 or req.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(413, f"Uploads are limited to {MAX_UPLOAD_BYTES} bytes.")
+    _expire_sessions()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    session = UploadSession(req.submission_id, req.filename, req.size, req.sha256, req.content_type)
+    open(session.path, "wb").close()
+    _sessions[session.id] = session
+    return dict(session.status(), chunk_size=DEFAULT_CHUNK_BYTES, max_chunk_size=MAX_CHUNK_BYTES)
+
+
+@router.get("/uploads/{upload_id}")
+def upload_status(upload_id: str, response: Response):
+    """Current offset of an upload; clients resume by sending the chunk that starts here."""
+    session = _get_session(upload_id)
+    response.headers["Upload-Offset"] = str(session.offset)
+    return session.status()
+
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(None)
+):
+    """
+    Append one chunk at `offset` (must equal the current offset; 409 returns the right one).
+    A mismatched X-Chunk-SHA256 discards the chunk so the client can resend just that piece.
+    """
+    session = _get_session(upload_id)
+    if not session.lock.acquire(blocking=False):
+        raise HTTPException(409, "Another chunk for this upload is in flight.")
+    try:
+        if offset != session.offset:
+            raise HTTPException(409, f"Offset mismatch; current offset is {session.offset}.",
+                                headers={"Upload-Offset": str(session.offset)})
+        digest = hashlib.sha256()
+        written = 0
+        f = open(session.path, "r+b")
+        try:
+            f.seek(offset)
+            async for block in request.stream():
+                written += len(block)
+                if written > MAX_CHUNK_BYTES or offset + written > session.size:
+                    raise HTTPException(413, "Chunk exceeds the chunk limit or the declared upload size.")
+                digest.update(block)
+                await run_in_threadpool(f.write, block)
+            if x_chunk_sha256 and digest.hexdigest() != x_chunk_sha256.lower():
+                raise HTTPException(422, "Chunk checksum mismatch; resend this chunk.",
+                                    headers={"Upload-Offset": str(session.offset)})
+            f.flush()
+        except BaseException:
+            # Roll back to the last good offset; only whole, verified chunks count
+            f.truncate(session.offset)
+            raise
+        finally:
+            f.close()
+        session.offset += written
+        session.touched = time.time()
+        return {"upload_id": session.id, "offset": session.offset, "complete": session.offset == session.size}
+    finally:
+        session.lock.release()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@router.post("/uploads/{upload_id}/finalize")
+def finalize_upload(upload_id: str):
+    """Verify the assembled file and attach it to the submission's documents."""
+    session = _get_session(upload_id)
+    with session.lock:
+        if session.offset != session.size:
+            raise HTTPException(409, f"Upload incomplete: {session.offset} of {session.size} bytes received.",
+                                headers={"Upload-Offset": str(session.offset)})
+        sha256 = _file_sha256(session.path)
+        if session.sha256 and sha256 != session.sha256:
+            raise HTTPException(422, "File checksum mismatch; upload must be restarted.")
+        s = _find_writable(session.submission_id)
+        target_dir = os.path.join(DOCUMENT_DIR, session.submission_id)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, f"{session.id}-{_safe_name(session.filename)}")
+        shutil.move(session.path, target)
+        document = {
+            "filename": session.filename,
+            "size": session.size,
+            "sha256": sha256,
+            "content_type": session.content_type,
+            "path": target,  # stored on disk, not in the in-memory store
+        }
+        try:
+            with _mutate(s):
+                s.add_document(document)
+        except BaseException:
+            shutil.move(target, session.path)  # not attached: keep the session resumable, no orphan file
+            raise
+        _sessions.pop(upload_id, None)
+    return {"message": f"Uploaded {session.filename}", "document": document}
+
+
+@router.delete("/uploads/{upload_id}")
+def abort_upload(upload_id: str):
+    session = _sessions.pop(upload_id, None)
+    if session is None:
+        raise HTTPException(404, "Upload session not found or expired.")
+    if os.path.exists(session.path):
+        os.remove(session.path)
+    return {"message": "Upload cancelled."}